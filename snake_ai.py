@@ -0,0 +1,587 @@
+import heapq
+import random
+import time
+from array import array
+from collections import deque
+
+from snake_engine import PLAYER, ENEMY, DIRECTIONS, OPPOSITE, NO_FOOD
+
+# Player policies, for games with nobody at the keyboard:
+#
+#     policy(game, rng) -> direction or None
+#
+# rng is a random.Random owned by the caller; None keeps going straight.
+
+def straight_player(game, rng):
+    return None
+
+def random_player(game, rng):
+    return rng.choice(DIRECTIONS)
+
+def cautious_player(game, rng):
+    # Head for the food, but never straight into a wall or the snake itself
+    head = game.snake.body[0]
+    food = game.food_pos or head
+    size = game.size
+    moves = []
+    for direction in DIRECTIONS:
+        cell = (head[0] + direction[0], head[1] + direction[1])
+        if (0 <= cell[0] < size and 0 <= cell[1] < size and
+                not game.occupancy.occupied(cell, PLAYER)):
+            distance = abs(food[0] - cell[0]) + abs(food[1] - cell[1])
+            moves.append((distance, rng.random(), direction))
+    return min(moves)[2] if moves else None
+
+AUTOPILOT_BUDGET = 0.002  # Seconds the autopilot may search per tick
+AUTOPILOT_NODES = 20000  # Cells it may search per tick when runs must repeat
+TABLE_SIZE = 1 << 16  # Positions the autopilot remembers before starting afresh
+CLOCK_EVERY = 64  # Cells searched between looks at the budget
+
+class Autopilot:
+    # Player policy that searches ahead, for demos and as a baseline:
+    #
+    # 1. A* from the head to the food. A cell of the snake's own body can be
+    #    entered once the tail has moved off it, so paths may follow the tail.
+    # 2. The path is only taken if, having eaten, the snake could still get
+    #    back to its tail, so it never walls itself in for the sake of food.
+    # 3. Otherwise the snake takes the move that keeps its tail in reach and
+    #    leaves it the most room.
+    #
+    # Enemies are modelled for the next tick: their cells are never
+    # entered, and neither is any cell next to the head of an enemy that
+    # moves this tick, since every enemy steps towards the player's head.
+    #
+    # Decisions are kept in a transposition table keyed by a Zobrist hash of
+    # the board, so a position seen before, in this game or an earlier one
+    # with the same seed, costs one lookup instead of a search. Between
+    # searches the snake walks the planned path while it stays safe.
+    #
+    # Searching stops once time_budget seconds of the tick are used up,
+    # and the snake makes the safe move nearest the food instead. Where it
+    # stops then depends on how busy the machine is, so runs that must give
+    # the same result every time pass node_budget instead: a number of
+    # cells searched per tick, counted every CLOCK_EVERY cells.
+    def __init__(self, time_budget=AUTOPILOT_BUDGET, table_size=TABLE_SIZE,
+                 node_budget=None):
+        self.time_budget = time_budget
+        self.table_size = table_size
+        self.node_budget = node_budget
+        self.size = None
+        self.decisions = 0
+        self.hits = 0  # Decisions found in the table
+        self.searches = 0
+        self.timeouts = 0
+
+    def resize(self, size):
+        n = size * size
+        self.size = size
+        # Zobrist keys: one per cell for each of body, head, tail, enemy and
+        # food, then the four directions, a pending growth and enemies moving
+        rng = random.Random(size)
+        self.keys = array('Q')
+        self.keys.frombytes(rng.randbytes(8 * (5 * n + 6)))
+        self.cost = array('i', [0]) * n
+        self.parent = array('i', [0]) * n
+        # A cell's cost and parent are valid only if its stamp matches
+        self.stamp = array('I', [0]) * n
+        self.current = 0
+        self.table = {}
+        self.game = None
+        self.tick = None
+        self.food = None
+        self.path = deque()  # Planned cells still to walk
+
+    def board_hash(self, game):
+        keys = self.keys
+        n = self.size * self.size
+        snake = game.snake
+        cells = snake.cells
+        h = keys[n + cells[0]] ^ keys[2 * n + cells[-1]] ^ keys[5 * n + snake.code]
+        for cell in cells:
+            h ^= keys[cell]
+        for enemy in game.enemies:
+            for cell in enemy.cells:
+                h ^= keys[3 * n + cell]
+        if game.food_cell != NO_FOOD:
+            h ^= keys[4 * n + game.food_cell]
+        if snake.grow:
+            h ^= keys[5 * n + 4]
+        if enemies_move(game):
+            h ^= keys[5 * n + 5]
+        return h
+
+    def __call__(self, game, rng=None):
+        if game.size != self.size:
+            self.resize(game.size)
+        if game is not self.game or game.ticks != self.tick + 1 or game.food_cell != self.food:
+            self.path.clear()
+        self.game = game
+        self.tick = game.ticks
+        self.food = game.food_cell
+        self.decisions += 1
+        moves = safe_moves(game)
+        if not moves:
+            return None
+
+        h = self.board_hash(game)
+        code = self.table.get(h)
+        path = self.path
+        if code is not None and code in moves.values():
+            self.hits += 1
+        elif path and path[0] in moves:
+            # Keep walking the planned path
+            code = moves[path[0]]
+        else:
+            self.searches += 1
+            if self.node_budget is None:
+                self.deadline = time.perf_counter() + self.time_budget
+            self.nodes_left = self.node_budget
+            self.timed_out = False
+            code = self.plan(game, moves)
+            if self.timed_out:
+                self.timeouts += 1
+                self.path.clear()
+                return DIRECTIONS[nearest_move(game, moves)]
+            path = self.path
+        if path and moves.get(path[0]) == code:
+            path.popleft()
+        else:
+            path.clear()
+        if len(self.table) >= self.table_size:
+            self.table.clear()
+        self.table[h] = code
+        return DIRECTIONS[code]
+
+    def plan(self, game, moves):
+        # Direction code of the best move, planning self.path on the way.
+        # Returns None with self.timed_out set if the budget ran out.
+        self.path = deque()
+        snake = game.snake
+        body = list(snake.cells)
+        waiting = 1 if snake.grow else 0
+        head = body[0]
+        food = game.food_cell
+        if food != NO_FOOD and self.search(head, food, body, waiting, game.occupancy,
+                                           set(moves)):
+            path = deque()
+            cell = food
+            while cell != head:
+                path.appendleft(cell)
+                cell = self.parent[cell]
+            # Where the snake will be when it has eaten, tail staying put
+            # for a tick as it grows
+            after = (list(reversed(path)) + body)[:len(body)]
+            if self.search(food, after[-1], after, 1, game.occupancy):
+                self.path = path
+                return moves[path[0]]
+        if self.timed_out:
+            return None
+
+        # No safe way to the food: keep the tail in reach and the most room
+        best = None
+        best_score = None
+        room = 2 * len(body) + 8
+        for cell, code in moves.items():
+            after = [cell] + (body if snake.grow else body[:-1])
+            tail = self.search(cell, after[-1], after, 0, game.occupancy)
+            space = self.search(cell, None, after, 0, game.occupancy, limit=room)
+            if self.timed_out:
+                return None
+            score = (tail, space, -distance(cell, food, game.size))
+            if best is None or score > best_score:
+                best = code
+                best_score = score
+        return best
+
+    def out_of_budget(self):
+        # Called every CLOCK_EVERY cells searched
+        if self.node_budget is None:
+            return time.perf_counter() > self.deadline
+        self.nodes_left -= CLOCK_EVERY
+        return self.nodes_left < 0
+
+    def search(self, start, goal, body, waiting, occupancy, first=None, limit=None):
+        # A* over packed cells from start to goal, or a flood fill counting
+        # up to limit cells when goal is None. body is the snake with its
+        # head on start; body cells can be entered once the tail has left
+        # them, waiting ticks later than usual. Enemy cells are blocked, and
+        # first, if given, holds the only cells allowed as the first step.
+        # Returns whether goal was reached, or the number of cells filled.
+        size = self.size
+        length = len(body)
+        free_at = {cell: length - i + 1 + waiting for i, cell in enumerate(body)}
+        cells = occupancy.cells
+        cost = self.cost
+        parent = self.parent
+        stamp = self.stamp
+        self.current += 1
+        current = self.current
+        stamp[start] = current
+        cost[start] = 0
+        if goal is None:
+            gx = gy = 0
+            heap = [(0, 0, start)]
+        else:
+            gx = goal % size
+            gy = goal // size
+            h = abs(gx - start % size) + abs(gy - start // size)
+            heap = [(h, h, start)]
+        last_row = size * (size - 1)
+        reached = 1
+        expanded = 0
+        while heap:
+            _, _, here = heapq.heappop(heap)
+            if here == goal:
+                return True
+            expanded += 1
+            if expanded % CLOCK_EVERY == 0 and self.out_of_budget():
+                self.timed_out = True
+                return False
+            depth = cost[here] + 1
+            x = here % size
+            for neighbour in (here - 1 if x > 0 else -1,
+                              here + 1 if x < size - 1 else -1,
+                              here - size if here >= size else -1,
+                              here + size if here < last_row else -1):
+                if neighbour < 0 or stamp[neighbour] == current:
+                    continue
+                if cells[neighbour] & ENEMY:
+                    continue
+                if neighbour in free_at and depth < free_at[neighbour]:
+                    continue
+                if depth == 1 and first is not None and neighbour not in first:
+                    continue
+                stamp[neighbour] = current
+                cost[neighbour] = depth
+                parent[neighbour] = here
+                reached += 1
+                if goal is None:
+                    if limit is not None and reached >= limit:
+                        return reached
+                    heapq.heappush(heap, (depth, 0, neighbour))
+                else:
+                    h = abs(gx - neighbour % size) + abs(gy - neighbour // size)
+                    heapq.heappush(heap, (depth + h, h, neighbour))
+        return False if goal is not None else reached
+
+def enemies_move(game):
+    # Whether the enemies take a step on the next tick
+    return any(enemy.move_counter + 1 >= enemy.move_every for enemy in game.enemies)
+
+def distance(a, b, size):
+    # Steps between two packed cells, ignoring anything in the way
+    if b == NO_FOOD:
+        return 0
+    return abs(a % size - b % size) + abs(a // size - b // size)
+
+def safe_moves(game):
+    # {cell: direction code} of every move that does not lose on the next
+    # tick: no wall, no body, no enemy, and nowhere an enemy can step to
+    snake = game.snake
+    size = game.size
+    head = snake.cells[0]
+    cells = game.occupancy.cells
+    moving = enemies_move(game)
+    x = head % size
+    y = head // size
+    moves = {}
+    for code, (dx, dy) in enumerate(DIRECTIONS):
+        if code == OPPOSITE[snake.code]:
+            continue
+        nx = x + dx
+        ny = y + dy
+        if not (0 <= nx < size and 0 <= ny < size):
+            continue
+        cell = ny * size + nx
+        if cells[cell]:
+            continue
+        if moving and any(0 <= nx + ex < size and 0 <= ny + ey < size and
+                          cells[(ny + ey) * size + nx + ex] & ENEMY
+                          for ex, ey in DIRECTIONS):
+            continue
+        moves[cell] = code
+    return moves
+
+def nearest_move(game, moves):
+    # Safe move that gets closest to the food
+    return min(moves.items(), key=lambda move: distance(move[0], game.food_cell, game.size))[1]
+
+# Player policies by name, as factories called once per game. The autopilot
+# keeps a table and a plan between ticks, so each game gets its own, with a
+# node budget rather than a clock: a game then plays out the same whatever
+# was played before it and however busy the machine is.
+PLAYER_POLICIES = {
+    'straight': lambda: straight_player,
+    'random': lambda: random_player,
+    'cautious': lambda: cautious_player,
+    'autopilot': lambda: Autopilot(node_budget=AUTOPILOT_NODES),
+}
+
+def make_player_policy(name):
+    return PLAYER_POLICIES[name]()
+
+# Enemy brains. An EnemySnake with a brain asks it for every move:
+#
+#     brain.choose_direction(head, target, occupancy) -> direction or None
+#
+# and calls brain.reset() whenever a new game starts. A brain that carries
+# anything from one tick to the next hands it over as a list of cells:
+#
+#     brain.saved_cells() -> cells, brain.restore_cells(cells)
+#
+# which is how GameState snapshots include it. GameState.clone() copies a
+# brain with
+#
+#     brain.clone(memo) -> brain
+#
+# where memo maps anything brains share to its copy, by id().
+#
+# None means every neighbouring cell is blocked and the enemy waits a tick.
+# Enemies never walk into walls, through the player's body or onto each
+# other; only the player's head is a valid cell to enter.
+
+NODE_BUDGET = 4000  # Cells a brain may expand per tick before falling back
+UNREACHABLE = 1 << 30
+
+def passable(cell, target, occupancy):
+    size = occupancy.size
+    if not (0 <= cell[0] < size and 0 <= cell[1] < size):
+        return False
+    return cell == target or not occupancy.occupied(cell)
+
+def greedy_direction(head, target, occupancy):
+    # Open neighbour that gets closest to the target as the crow flies
+    best = None
+    best_distance = None
+    for direction in DIRECTIONS:
+        cell = (head[0] + direction[0], head[1] + direction[1])
+        if passable(cell, target, occupancy):
+            distance = abs(target[0] - cell[0]) + abs(target[1] - cell[1])
+            if best is None or distance < best_distance:
+                best = direction
+                best_distance = distance
+    return best
+
+def step_towards(head, cell):
+    return [cell[0] - head[0], cell[1] - head[1]]
+
+class PathPlanner:
+    # A* from the enemy to the player's head, expanding at most node_budget
+    # cells per tick. When the budget runs out the last complete path is
+    # followed for as long as it stays open, then the partial path to the
+    # cell that got closest to the target.
+    def __init__(self, node_budget=NODE_BUDGET):
+        self.node_budget = node_budget
+        self.reset()
+
+    def reset(self):
+        self.path = deque()
+        self.partial = deque()
+
+    def saved_cells(self):
+        # The partial path is planned afresh every tick, so only the last
+        # complete path needs keeping
+        return list(self.path)
+
+    def restore_cells(self, cells):
+        self.path = deque(cells)
+
+    def clone(self, memo):
+        planner = PathPlanner(self.node_budget)
+        planner.path = deque(self.path)
+        return planner
+
+    def choose_direction(self, head, target, occupancy):
+        path = self.plan(head, target, occupancy)
+        if path is not None:
+            self.path = path
+        else:
+            # Drop the cells of the cached path we have already walked
+            while self.path and self.path[0] != head:
+                self.path.popleft()
+            if self.path:
+                self.path.popleft()
+            path = self.path
+            if not path or not passable(path[0], target, occupancy):
+                path = self.partial
+        if path:
+            return step_towards(head, path[0])
+        return greedy_direction(head, target, occupancy)
+
+    def plan(self, head, target, occupancy):
+        # Returns the cells from head (exclusive) to target, or None if the
+        # target could not be reached within the budget
+        came_from = {head: None}
+        cost = {head: 0}
+        # Ties on f are broken towards the cell nearer the target, otherwise
+        # an open board makes A* expand the whole rectangle between the two
+        h = abs(target[0] - head[0]) + abs(target[1] - head[1])
+        heap = [(h, h, 0, head)]
+        closest = head
+        closest_distance = h
+        expanded = 0
+        found = False
+        while heap and expanded < self.node_budget:
+            _, _, g, cell = heapq.heappop(heap)
+            if cell == target:
+                found = True
+                break
+            if g > cost[cell]:
+                continue
+            expanded += 1
+            for direction in DIRECTIONS:
+                neighbour = (cell[0] + direction[0], cell[1] + direction[1])
+                if (neighbour not in cost or g + 1 < cost[neighbour]) and \
+                        passable(neighbour, target, occupancy):
+                    cost[neighbour] = g + 1
+                    came_from[neighbour] = cell
+                    h = abs(target[0] - neighbour[0]) + abs(target[1] - neighbour[1])
+                    if h < closest_distance:
+                        closest = neighbour
+                        closest_distance = h
+                    heapq.heappush(heap, (g + 1 + h, h, g + 1, neighbour))
+
+        end = target if found else closest
+        path = deque()
+        while end != head:
+            path.appendleft(end)
+            end = came_from[end]
+        self.partial = path
+        return path if found else None
+
+class FlowField:
+    # Breadth-first distances from the player's head, shared by any number
+    # of enemies. Only the player's body blocks the field; enemies step
+    # around each other when they pick a move. The field is rebuilt only
+    # when the head moves and is grown lazily: each query expands the
+    # search just far enough to answer it, so a tick costs as much as the
+    # farthest enemy needs and no more, capped at node_budget cells.
+    def __init__(self, size, node_budget=NODE_BUDGET):
+        self.size = size
+        self.node_budget = node_budget
+        # Made on first use, so cloned games that are never stepped skip it
+        self.distance = None
+        # A cell's distance is valid only if its stamp matches the field's
+        self.stamp = None
+        self.current = 0
+        self.target = None
+        self.frontier = deque()
+
+    def reset(self, target, occupancy):
+        if self.distance is None:
+            self.distance = [0] * (self.size * self.size)
+            self.stamp = [0] * (self.size * self.size)
+        self.current += 1
+        self.target = target
+        self.occupancy = occupancy
+        self.expanded = 0
+        index = target[1] * self.size + target[0]
+        self.distance[index] = 0
+        self.stamp[index] = self.current
+        self.frontier = deque([index])
+
+    def distance_to(self, cell):
+        # Steps from cell to the target, UNREACHABLE if it is walled off, or
+        # None if it is not known yet and the budget for this tick has run out
+        size = self.size
+        index = cell[1] * size + cell[0]
+        distance = self.distance
+        stamp = self.stamp
+        current = self.current
+        frontier = self.frontier
+        cells = self.occupancy.cells
+        last_row = size * (size - 1)
+        while stamp[index] != current:
+            if not frontier:
+                return UNREACHABLE
+            if self.expanded >= self.node_budget:
+                return None
+            here = frontier.popleft()
+            self.expanded += 1
+            next_distance = distance[here] + 1
+            # Left, right, up and down, skipping the board edges
+            x = here % size
+            if x > 0:
+                neighbour = here - 1
+                if stamp[neighbour] != current and not cells[neighbour] & PLAYER:
+                    distance[neighbour] = next_distance
+                    stamp[neighbour] = current
+                    frontier.append(neighbour)
+            if x < size - 1:
+                neighbour = here + 1
+                if stamp[neighbour] != current and not cells[neighbour] & PLAYER:
+                    distance[neighbour] = next_distance
+                    stamp[neighbour] = current
+                    frontier.append(neighbour)
+            if here >= size:
+                neighbour = here - size
+                if stamp[neighbour] != current and not cells[neighbour] & PLAYER:
+                    distance[neighbour] = next_distance
+                    stamp[neighbour] = current
+                    frontier.append(neighbour)
+            if here < last_row:
+                neighbour = here + size
+                if stamp[neighbour] != current and not cells[neighbour] & PLAYER:
+                    distance[neighbour] = next_distance
+                    stamp[neighbour] = current
+                    frontier.append(neighbour)
+        return distance[index]
+
+class FlowFieldChaser:
+    # Walks down a shared FlowField towards the player's head
+    def __init__(self, field):
+        self.field = field
+
+    def reset(self):
+        # Forces the shared field to be rebuilt on the next move
+        self.field.target = None
+
+    def saved_cells(self):
+        # The player's head moves every tick and the enemies move together,
+        # so the field is always rebuilt before it is used again
+        return []
+
+    def restore_cells(self, cells):
+        pass
+
+    def clone(self, memo):
+        # For the same reason a fresh field does, made once for all the
+        # chasers sharing this one
+        field = memo.get(id(self.field))
+        if field is None:
+            field = memo[id(self.field)] = FlowField(self.field.size, self.field.node_budget)
+        return FlowFieldChaser(field)
+
+    def choose_direction(self, head, target, occupancy):
+        field = self.field
+        if field.target != target:
+            field.reset(target, occupancy)
+        best = None
+        best_distance = None
+        for direction in DIRECTIONS:
+            cell = (head[0] + direction[0], head[1] + direction[1])
+            if not passable(cell, target, occupancy):
+                continue
+            distance = field.distance_to(cell)
+            if distance is None:
+                # Out of budget this tick
+                return greedy_direction(head, target, occupancy)
+            if best is None or distance < best_distance:
+                best = direction
+                best_distance = distance
+        return best
+
+ENEMY_BRAINS = ('greedy', 'astar', 'flow')
+
+def make_enemy_brains(kind, count, size, node_budget=NODE_BUDGET):
+    # One brain per enemy. 'greedy' is the original straight-line chase and
+    # needs no brain at all; flow-field enemies all share one field.
+    if kind == 'greedy':
+        return [None] * count
+    if kind == 'astar':
+        return [PathPlanner(node_budget) for _ in range(count)]
+    if kind == 'flow':
+        field = FlowField(size, node_budget)
+        return [FlowFieldChaser(field) for _ in range(count)]
+    raise ValueError('unknown enemy brain %r, expected one of %s'
+                     % (kind, ', '.join(ENEMY_BRAINS)))
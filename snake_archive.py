@@ -0,0 +1,278 @@
+import argparse
+import glob
+import mmap
+import os
+import struct
+import time
+
+from snake_engine import GameState
+from snake_ai import make_enemy_brains
+from snake_replay import Replay, ReplayError, ReplayRecorder, play_replay
+
+# Many replays in one append-only file:
+#
+#     python snake_archive.py add games.snka 'replays/*.snkr'
+#     python snake_archive.py list games.snka --min-score 5
+#     python snake_archive.py seek games.snka 12 1500
+#
+# The file is a chain of index blocks, each followed by the games appended
+# while it had room. A block is a BLOCK header and BLOCK_ENTRIES fixed-size
+# ENTRY slots:
+#
+#     BLOCK    magic, version, slots, slots used, offset of the next block
+#     ENTRY    offset and length of the replay, length of the snapshots
+#              after it, seed, ticks, score
+#
+# Each game is its replay bytes followed by any number of snapshots, each a
+# SNAPSHOT header (tick, length) and a GameState.snapshot(). A new game is
+# written first and its entry afterwards, so a crash can only lose the game
+# being added.
+#
+# Readers map the file and unpack entries straight from the mapping, so
+# listing and filtering use the same memory whatever the size of the
+# archive, and loading a game reads only that game's bytes.
+
+MAGIC = b'SNKA'
+VERSION = 2  # 1 held version 2 replays and snapshots with the free-cell list
+BLOCK = struct.Struct('<4sB3xIIQ')
+ENTRY = struct.Struct('<QIIQIH2x')
+SNAPSHOT = struct.Struct('<II')
+BLOCK_ENTRIES = 4096
+SNAPSHOT_EVERY = 500  # Ticks between snapshots of games added from replays
+
+class ArchiveError(ValueError):
+    pass
+
+class Entry:
+    def __init__(self, index, offset, length, snapshots_length, seed, ticks, score):
+        self.index = index
+        self.offset = offset
+        self.length = length
+        self.snapshots_length = snapshots_length
+        self.seed = seed
+        self.ticks = ticks
+        self.score = score
+
+def read_block(data, offset):
+    magic, version, slots, used, next_block = BLOCK.unpack_from(data, offset)
+    if magic != MAGIC:
+        raise ArchiveError('not a replay archive')
+    if version != VERSION:
+        raise ArchiveError('unsupported archive version %d' % version)
+    return slots, used, next_block
+
+class ArchiveWriter:
+    # Appends games to an archive, creating it if needed
+    def __init__(self, path, block_entries=BLOCK_ENTRIES):
+        self.file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        self.file.seek(0, os.SEEK_END)
+        if self.file.tell() == 0:
+            self.add_block(block_entries)
+        # Find the last block, which is the only one with free slots
+        self.block = 0
+        while True:
+            self.file.seek(self.block)
+            self.slots, self.used, next_block = read_block(self.file.read(BLOCK.size), 0)
+            if not next_block:
+                break
+            self.block = next_block
+
+    def add_block(self, slots):
+        offset = self.file.seek(0, os.SEEK_END)
+        self.file.write(BLOCK.pack(MAGIC, VERSION, slots, 0, 0))
+        self.file.write(bytes(slots * ENTRY.size))
+        return offset
+
+    def write_header(self, next_block=0):
+        self.file.seek(self.block)
+        self.file.write(BLOCK.pack(MAGIC, VERSION, self.slots, self.used, next_block))
+
+    def append(self, replay, snapshots=()):
+        # snapshots are (tick, data) pairs, as kept by ReplayRecorder
+        if self.used == self.slots:
+            block = self.add_block(self.slots)
+            self.file.flush()
+            self.write_header(block)
+            self.block = block
+            self.used = 0
+        data = replay.to_bytes()
+        offset = self.file.seek(0, os.SEEK_END)
+        self.file.write(data)
+        snapshots_length = 0
+        for tick, snapshot in snapshots:
+            self.file.write(SNAPSHOT.pack(tick, len(snapshot)))
+            self.file.write(snapshot)
+            snapshots_length += SNAPSHOT.size + len(snapshot)
+        self.file.flush()
+        self.file.seek(self.block + BLOCK.size + self.used * ENTRY.size)
+        self.file.write(ENTRY.pack(offset, len(data), snapshots_length, replay.seed,
+                                   replay.ticks, replay.score))
+        self.file.flush()
+        self.used += 1
+        self.write_header()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ArchiveReader:
+    # Read-only view of an archive, through a memory map
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        # Slices of the view read the mapping in place; slices of data copy
+        self.view = memoryview(self.data)
+        read_block(self.data, 0)
+        self.games = {}  # One GameState per set of game settings, for seeking
+
+    def entries(self):
+        data = self.data
+        index = 0
+        for block in self.blocks():
+            used = read_block(data, block)[1]
+            for slot in range(used):
+                yield Entry(index, *ENTRY.unpack_from(data, block + BLOCK.size + slot * ENTRY.size))
+                index += 1
+
+    def __len__(self):
+        return sum(read_block(self.data, block)[1] for block in self.blocks())
+
+    def blocks(self):
+        block = 0
+        while True:
+            yield block
+            block = read_block(self.data, block)[2]
+            if not block:
+                return
+
+    def filter(self, min_score=0, max_score=None):
+        for entry in self.entries():
+            if entry.score >= min_score and (max_score is None or entry.score <= max_score):
+                yield entry
+
+    def entry(self, index):
+        # Every block but the last is full, so this skips whole blocks
+        if index < 0:
+            raise IndexError('archive has no game %d' % index)
+        slot = index
+        for block in self.blocks():
+            slots, used, _ = read_block(self.data, block)
+            if slot < used:
+                return Entry(index, *ENTRY.unpack_from(self.data,
+                                                       block + BLOCK.size + slot * ENTRY.size))
+            slot -= used
+        raise IndexError('archive has no game %d' % index)
+
+    def load(self, index):
+        entry = self.entry(index) if isinstance(index, int) else index
+        return Replay.from_bytes(self.view[entry.offset:entry.offset + entry.length])
+
+    def snapshots(self, index):
+        # (tick, offset, length) of each snapshot of a game, without reading them
+        entry = self.entry(index) if isinstance(index, int) else index
+        position = entry.offset + entry.length
+        end = position + entry.snapshots_length
+        while position < end:
+            tick, length = SNAPSHOT.unpack_from(self.data, position)
+            position += SNAPSHOT.size
+            yield tick, position, length
+            position += length
+
+    def seek(self, index, tick):
+        # The game as it was after `tick` ticks, played on from the last
+        # snapshot before that instead of from the start
+        entry = self.entry(index) if isinstance(index, int) else index
+        replay = self.load(entry)
+        snapshot = None
+        for snapshot_tick, offset, length in self.snapshots(entry):
+            if snapshot_tick > tick:
+                break
+            snapshot = self.view[offset:offset + length]
+        key = (replay.size, replay.enemy, replay.enemies)
+        game = self.games.get(key)
+        if game is None:
+            game = GameState(make_enemy_brains(replay.enemy, replay.enemies, replay.size),
+                             replay.size)
+            self.games[key] = game
+        return play_replay(replay, game, tick, snapshot)
+
+    def close(self):
+        self.view.release()
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def snapshots_of(replay, every=SNAPSHOT_EVERY):
+    # Plays a replay and takes the snapshots its recorder would have taken
+    game = GameState(make_enemy_brains(replay.enemy, replay.enemies, replay.size),
+                     replay.size)
+    recorder = ReplayRecorder(game, replay.enemy, every)
+    game.reset(replay.seed)
+    recorder.start()
+    for tick, direction in replay.iter_turns():
+        while game.ticks < tick and recorder.step():
+            pass
+        recorder.step(direction)
+    while game.ticks < replay.ticks and recorder.step():
+        pass
+    return recorder.snapshots
+
+def main():
+    parser = argparse.ArgumentParser(description='Store and query many snake replays')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help='append replay files to an archive')
+    add.add_argument('archive')
+    add.add_argument('paths', nargs='+', help='replay files or glob patterns')
+    add.add_argument('--snapshot-every', type=int, default=SNAPSHOT_EVERY)
+    listing = commands.add_parser('list', help='list the games in an archive')
+    listing.add_argument('archive')
+    listing.add_argument('--min-score', type=int, default=0)
+    listing.add_argument('--max-score', type=int, default=None)
+    seek = commands.add_parser('seek', help='show a game as it was at some tick')
+    seek.add_argument('archive')
+    seek.add_argument('index', type=int)
+    seek.add_argument('tick', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'add':
+        paths = []
+        for pattern in args.paths:
+            paths.extend(sorted(glob.glob(pattern)) or [pattern])
+        added = 0
+        with ArchiveWriter(args.archive) as writer:
+            for path in paths:
+                try:
+                    replay = Replay.load(path)
+                except (OSError, ReplayError) as error:
+                    print('%s: %s' % (path, error))
+                    continue
+                writer.append(replay, snapshots_of(replay, args.snapshot_every))
+                added += 1
+        print('added %d replays' % added)
+    elif args.command == 'list':
+        with ArchiveReader(args.archive) as reader:
+            print('%8s %20s %6s %8s' % ('game', 'seed', 'score', 'ticks'))
+            for entry in reader.filter(args.min_score, args.max_score):
+                print('%8d %20d %6d %8d' % (entry.index, entry.seed, entry.score, entry.ticks))
+    elif args.command == 'seek':
+        with ArchiveReader(args.archive) as reader:
+            start = time.perf_counter()
+            game = reader.seek(args.index, args.tick)
+            elapsed = time.perf_counter() - start
+            print('tick %d: score %d, head at %s, food at %s, %s'
+                  % (game.ticks, game.score, game.snake.body[0], game.food_pos,
+                     game.death or 'alive'))
+            print('found in %.2f ms' % (1000 * elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,553 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from snake_engine import GRID_COUNT, PLAYER, Occupancy, Snake, GameState, direction_code
+from snake_ai import AUTOPILOT_BUDGET, ENEMY_BRAINS, Autopilot, cautious_player, make_enemy_brains
+
+def ticks_per_second(game, seconds, seed=0):
+    # Step the game with the cautious player for about `seconds`, starting
+    # a new game whenever one ends
+    rng = random.Random(seed)
+    random.seed(seed)
+    ticks = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            if not game.step(cautious_player(game, rng)):
+                game.reset()
+            ticks += 1
+    return ticks / (time.perf_counter() - start)
+
+def bench_horde(size, enemy_counts, brain, seconds):
+    print('horde: %dx%d board, %s enemies' % (size, size, brain))
+    print('%8s %12s' % ('enemies', 'ticks/s'))
+    for count in enemy_counts:
+        game = GameState(make_enemy_brains(brain, count, size), size)
+        print('%8d %12.0f' % (count, ticks_per_second(game, seconds)))
+
+def bench_vector(num_games, size, steps):
+    # Imported here so the other benchmarks do not need NumPy
+    import numpy as np
+    from snake_vec_env import NO_TURN, VectorSnakeEnv
+
+    env = VectorSnakeEnv(num_games, size, seed=0)
+    rng = np.random.default_rng(0)
+    actions = rng.integers(NO_TURN, 4, (steps, num_games))
+    start = time.perf_counter()
+    for tick_actions in actions:
+        env.step(tick_actions)
+    elapsed = time.perf_counter() - start
+    print('vector: %d games on a %dx%d board, %.0f game ticks/s'
+          % (num_games, size, size, num_games * steps / elapsed))
+
+def bench_replay(games, brain, enemies):
+    # Record games of the cautious player, then time checking them all
+    from snake_replay import Replay, ReplayChecker, ReplayRecorder
+
+    rng = random.Random(0)
+    game = GameState(make_enemy_brains(brain, enemies, GRID_COUNT))
+    recorder = ReplayRecorder(game, brain)
+    replays = []
+    for seed in range(games):
+        game.reset(seed)
+        recorder.start()
+        while game.ticks < 10000 and recorder.step(cautious_player(game, rng)):
+            pass
+        replays.append(recorder.replay().to_bytes())
+    size = sum(len(data) for data in replays)
+    print('replay: %d games, %.1f bytes each on average' % (games, size / games))
+
+    checker = ReplayChecker()
+    start = time.perf_counter()
+    failed = sum(checker.check(Replay.from_bytes(data)) is not None for data in replays)
+    elapsed = time.perf_counter() - start
+    print('checked in %.2f s, %.0f replays/min, %d failed'
+          % (elapsed, 60 * games / elapsed, failed))
+
+def bench_archive(games, path):
+    # Fill an archive, then time listing it and seeking into its longest game
+    from snake_archive import ArchiveReader, ArchiveWriter
+    from snake_replay import ReplayRecorder, play_replay
+
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(0)
+    game = GameState(size=60)
+    recorder = ReplayRecorder(game, snapshot_every=100)
+    with ArchiveWriter(path) as writer:
+        for seed in range(games):
+            game.reset(seed)
+            recorder.start()
+            while game.ticks < 10000 and recorder.step(cautious_player(game, rng)):
+                pass
+            writer.append(recorder.replay(), recorder.snapshots)
+    print('archive: %d games, %.0f bytes each on average'
+          % (games, os.path.getsize(path) / games))
+
+    with ArchiveReader(path) as reader:
+        start = time.perf_counter()
+        longest = max(reader.entries(), key=lambda entry: entry.ticks)
+        elapsed = time.perf_counter() - start
+        print('listed in %.1f ms, %.0f entries/s' % (1000 * elapsed, games / elapsed))
+        start = time.perf_counter()
+        high = sum(1 for _ in reader.filter(min_score=5))
+        print('%d games scored 5 or more, filtered in %.1f ms'
+              % (high, 1000 * (time.perf_counter() - start)))
+
+        tick = longest.ticks - 1
+        replay = reader.load(longest)
+        reader.seek(longest, tick)  # Builds the game it seeks with
+        start = time.perf_counter()
+        for _ in range(20):
+            play_replay(replay, game, tick)
+        from_start = (time.perf_counter() - start) / 20
+        start = time.perf_counter()
+        for _ in range(20):
+            reader.seek(longest, tick)
+        seek = (time.perf_counter() - start) / 20
+        print('seek to tick %d: %.2f ms from the start, %.2f ms from a snapshot'
+              % (tick, 1000 * from_start, 1000 * seek))
+    os.remove(path)
+
+def bench_memory(games, sizes, enemies, ticks):
+    # Bytes each GameState keeps alive, from tracemalloc over many games:
+    # just made, and after up to `ticks` ticks of the cautious player
+    import tracemalloc
+
+    print('memory: %d games per board, %d enemies each' % (games, enemies))
+    print('%8s %14s %14s' % ('board', 'new B/game', 'played B/game'))
+    for size in sizes:
+        rng = random.Random(0)
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        states = [GameState(make_enemy_brains('greedy', enemies, size), size, seed)
+                  for seed in range(games)]
+        fresh = tracemalloc.get_traced_memory()[0] - start
+        for game in states:
+            for _ in range(ticks):
+                if not game.step(cautious_player(game, rng)):
+                    break
+        played = tracemalloc.get_traced_memory()[0] - start
+        tracemalloc.stop()
+        del states
+        print('%8s %14.0f %14.0f' % ('%dx%d' % (size, size), fresh / games, played / games))
+
+def bench_clone(sizes, brain, enemies, seconds):
+    # Copies of a game part way through: as a snapshot, restored from one,
+    # cloned, cloned and stepped (what rollback does every tick), and with
+    # copy.deepcopy() for comparison
+    import copy
+
+    print('clone: %d %s enemies, games 50 ticks in' % (enemies, brain))
+    print('%8s %9s %11s %11s %11s %11s %11s' % ('board', 'bytes', 'snapshot/s', 'restore/s',
+                                                'clone/s', 'clone+step', 'deepcopy/s'))
+    for size in sizes:
+        game = GameState(make_enemy_brains(brain, enemies, size), size, 0)
+        rng = random.Random(0)
+        for _ in range(50):
+            game.step(cautious_player(game, rng))
+        data = game.snapshot()
+        restored = GameState(make_enemy_brains(brain, enemies, size), size)
+
+        def clone_and_step():
+            game.clone().step()
+        print('%8s %9d %11.0f %11.0f %11.0f %11.0f %11.0f' % (
+            '%dx%d' % (size, size), len(data),
+            calls_per_second(game.snapshot, seconds),
+            calls_per_second(lambda: restored.restore(data), seconds),
+            calls_per_second(game.clone, seconds),
+            calls_per_second(clone_and_step, seconds),
+            calls_per_second(lambda: copy.deepcopy(game), seconds)))
+
+def bench_autopilot(games, sizes, enemies, brain, budget, max_ticks=5000):
+    # Decisions per second of the autopilot, counting only the time spent
+    # deciding, and how its games end. Every seed is played twice, the
+    # second time mostly from the transposition table.
+    print('autopilot: %d games per board, %d %s enemies, %.1f ms per tick'
+          % (games, enemies, brain, 1000 * budget))
+    print('%8s %6s %12s %9s %9s %9s %6s %6s' % ('board', 'pass', 'decisions/s', 'p99 ms',
+                                                'table', 'timeouts', 'won', 'score'))
+    for size in sizes:
+        autopilot = Autopilot(budget)
+        game = GameState(make_enemy_brains(brain, enemies, size), size)
+        for repeat in ('first', 'again'):
+            times = []
+            won = score = 0
+            hits = autopilot.hits
+            timeouts = autopilot.timeouts
+            for seed in range(games):
+                game.reset(seed)
+                while game.ticks < max_ticks:
+                    start = time.perf_counter()
+                    direction = autopilot(game)
+                    times.append(time.perf_counter() - start)
+                    if not game.step(direction):
+                        break
+                won += game.victory
+                score += game.score
+            times.sort()
+            print('%8s %6s %12.0f %9.2f %8.0f%% %9d %5.0f%% %6.1f' % (
+                '%dx%d' % (size, size), repeat, len(times) / sum(times),
+                1000 * times[int(0.99 * len(times))],
+                100 * (autopilot.hits - hits) / len(times), autopilot.timeouts - timeouts,
+                100 * won / games, score / games))
+
+# The suite: every hot path of the game, timed headless and written out as
+# JSON so runs can be compared:
+#
+#     python snake_bench.py suite --out before.json
+#     ... change something ...
+#     python snake_bench.py suite --out after.json --baseline before.json
+#
+# Each result is a value with its unit and whether higher is better.
+
+SUITE_SIZES = (30, 100, 300)
+SUITE_LENGTHS = (1, 0.1, 0.5)  # Snake lengths: cells, or fractions of the board
+SUITE_FILLS = (0.0, 0.5, 0.9, 0.99)
+# (board size, cell pixels, low detail) of the camera frames in the suite
+VIEW_BOARDS = ((200, 20, False), (1000, 20, False), (200, 4, True), (1000, 4, True))
+SUITE_SECTIONS = ('startup', 'sim', 'food', 'draw', 'frame')
+REGRESSION_THRESHOLD = 0.10  # Slowdown that counts as a regression
+
+def calls_per_second(func, seconds):
+    # Best of three rounds, each about a third of `seconds` long
+    best = 0.0
+    for _ in range(3):
+        calls = 0
+        batch = 1
+        start = time.perf_counter()
+        deadline = start + seconds / 3
+        while True:
+            for _ in range(batch):
+                func()
+            calls += batch
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            batch = min(batch * 2, 1000)
+        best = max(best, calls / (now - start))
+    return best
+
+def rate(value, unit):
+    return {'value': value, 'unit': unit, 'higher_is_better': True}
+
+def duration(seconds):
+    return {'value': seconds * 1e6, 'unit': 'us', 'higher_is_better': False}
+
+def hamiltonian_cycle(size):
+    # Along the top row, back and forth over the rest of the board and up
+    # the first column. Needs an even size.
+    cycle = [(x, 0) for x in range(size)]
+    for y in range(1, size):
+        xs = range(size - 1, 0, -1) if y % 2 else range(1, size)
+        cycle.extend((x, y) for x in xs)
+    cycle.extend((0, y) for y in range(size - 1, 0, -1))
+    return cycle
+
+def suite_simulation(results, seconds):
+    for size in SUITE_SIZES:
+        # Snake.move on its own, going round a cycle that covers the board
+        cycle = hamiltonian_cycle(size)
+        for length in SUITE_LENGTHS:
+            length = max(1, int(length * size * size)) if length < 1 else length
+            snake = Snake(Occupancy(size))
+            snake.occupancy.remove_cell(snake.cells[0], PLAYER)
+            snake.cells.clear()
+            snake.cells.extend(y * size + x for x, y in reversed(cycle[:length]))
+            for cell in snake.cells:
+                snake.occupancy.add_cell(cell, PLAYER)
+            codes = [direction_code((b[0] - a[0], b[1] - a[1]))
+                     for a, b in zip(cycle, cycle[1:] + cycle[:1])]
+            position = [length - 1]
+
+            def move():
+                snake.code = codes[position[0]]
+                snake.move()
+                position[0] = (position[0] + 1) % len(cycle)
+            results['sim.move.size%d.length%d' % (size, length)] = rate(
+                calls_per_second(move, seconds), 'moves/s')
+
+        # Whole ticks, with the cautious player and one enemy
+        game = GameState(size=size)
+        results['sim.step.size%d' % size] = rate(ticks_per_second(game, seconds), 'ticks/s')
+        results['sim.clone.size%d' % size] = rate(calls_per_second(game.clone, seconds),
+                                                  'clones/s')
+
+def suite_food(results, seconds):
+    for size in (30, 300):
+        for fill in SUITE_FILLS:
+            game = GameState(size=size)
+            occupancy = game.occupancy
+            for pos in occupancy.random_free_cells(int(fill * occupancy.free_count())):
+                occupancy.add(pos, PLAYER)
+            results['food.size%d.fill%d' % (size, round(fill * 100))] = duration(
+                1 / calls_per_second(game.place_food, seconds))
+
+def suite_drawing(results, seconds, screen):
+    import snake_game as sg
+
+    game = GameState()
+    snake = game.snake
+    long_snake = Snake(Occupancy())
+    long_snake.cells.clear()
+    long_snake.cells.extend(y * GRID_COUNT + x
+                            for y in range(0, GRID_COUNT, 2) for x in range(GRID_COUNT))
+    pos = (5, 5)
+    draws = {
+        'draw_snake_segment': lambda: sg.draw_snake_segment(screen, pos, snake, True),
+        'draw_snake.length1': lambda: sg.draw_snake(screen, snake),
+        'draw_snake.length%d' % len(long_snake.body): lambda: sg.draw_snake(screen, long_snake),
+        'draw_tongue': lambda: sg.draw_tongue(screen, pos, snake.direction),
+        'draw_food_block': lambda: sg.draw_food_block(screen, pos),
+        'draw_food': lambda: sg.draw_food(screen, pos),
+        'draw_enemy_snake': lambda: sg.draw_enemy_snake(screen, pos),
+        'draw_score': lambda: sg.draw_score(screen, 7),
+        'draw_game_over': lambda: sg.draw_game_over(screen, 7),
+        'draw_victory': lambda: sg.draw_victory(screen, 10),
+        'draw_background': lambda: sg.draw_background(screen),
+        'draw_title_screen': lambda: sg.draw_title_screen(screen),
+        'draw_how_to_play': lambda: sg.draw_how_to_play(screen),
+    }
+    for name, draw in draws.items():
+        results['draw.' + name] = duration(1 / calls_per_second(draw, seconds))
+
+    # Textures are built on first use and kept; this is the cost of that
+    def cold_background():
+        sg.texture_cache.clear()
+        sg.draw_background(screen)
+    results['draw.draw_background.uncached'] = duration(1 / calls_per_second(cold_background,
+                                                                             seconds))
+
+def suite_frames(results, seconds, screen):
+    import pygame
+    import snake_game as sg
+
+    def title():
+        sg.draw_title_screen(screen)
+        pygame.display.flip()
+
+    def how_to_play():
+        sg.draw_how_to_play(screen)
+        pygame.display.flip()
+
+    def game_over():
+        screen.fill(sg.BLACK)
+        sg.draw_game_over(screen, 7)
+        pygame.display.flip()
+
+    def victory():
+        sg.draw_victory(screen, 10)
+        pygame.display.flip()
+
+    frames = {'title': title, 'how_to_play': how_to_play,
+              'game_over': game_over, 'victory': victory}
+
+    background = pygame.Surface(screen.get_size())
+    sg.draw_background(background)
+    rng = random.Random(0)
+    for dirty in (False, True):
+        game = GameState(seed=0)
+        renderer = sg.GameRenderer(background, dirty)
+
+        def gameplay(game=game, renderer=renderer):
+            # One tick and one frame, as main() does at GAME_SPEED == FRAME_RATE
+            if not game.step(cautious_player(game, rng)):
+                game.reset()
+                renderer.invalidate()
+            rects = renderer.draw(screen, game)
+            if renderer.dirty:
+                pygame.display.update(rects)
+            else:
+                pygame.display.flip()
+        frames['gameplay.dirty' if dirty else 'gameplay.full'] = gameplay
+
+    # Boards bigger than the window, through the camera, with sprites and
+    # with flat colours. Frame times should not depend on the board size.
+    for size, cell, lod in VIEW_BOARDS:
+        game = GameState(size=size, seed=0)
+        renderer = sg.GameRenderer(background, view=sg.BoardView(size, cell), lod=lod)
+
+        def gameplay(game=game, renderer=renderer):
+            if not game.step(cautious_player(game, rng)):
+                game.reset()
+                renderer.invalidate()
+            renderer.draw(screen, game)
+            pygame.display.flip()
+        frames['view.%d.%s' % (size, 'flat' if lod else 'sprites')] = gameplay
+
+    for name, frame in frames.items():
+        results['frame.' + name] = duration(1 / calls_per_second(frame, seconds))
+
+STARTUP_RUNS = 5
+
+def suite_startup(results):
+    # Fresh interpreters, as a player would start the game; best of a few
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    here = os.path.dirname(os.path.abspath(__file__))
+    scripts = {
+        'startup.import': 'import time; start = time.perf_counter(); import snake_game; '
+                          'print(time.perf_counter() - start)',
+        'startup.first_frame': 'import snake_game; print(snake_game.main(frames=1))',
+    }
+    for name, script in scripts.items():
+        best = min(float(subprocess.run([sys.executable, '-c', script], cwd=here, env=env,
+                                        capture_output=True, text=True, check=True).stdout)
+                   for _ in range(STARTUP_RUNS))
+        results[name] = duration(best)
+
+def run_suite(seconds, sections):
+    # Under the dummy driver SDL needs no display, so this runs anywhere
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    results = {}
+    if 'startup' in sections:
+        suite_startup(results)
+    if 'sim' in sections:
+        suite_simulation(results, seconds)
+    if 'food' in sections:
+        suite_food(results, seconds)
+    if 'draw' in sections or 'frame' in sections:
+        import pygame
+        import snake_game
+        screen = snake_game.init_display()
+        if 'draw' in sections:
+            suite_drawing(results, seconds, screen)
+        if 'frame' in sections:
+            suite_frames(results, seconds, screen)
+        meta_pygame = pygame.version.ver
+    else:
+        meta_pygame = None
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'pygame': meta_pygame,
+            'platform': platform.platform(),
+            'seconds': seconds,
+        },
+        'results': results,
+    }
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    # Returns one line per result, and the names of those that regressed
+    lines = []
+    regressions = []
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            lines.append('%-40s %12.1f %-8s (new)' % (name, result['value'], result['unit']))
+            continue
+        change = result['value'] / old['value'] - 1 if old['value'] else 0.0
+        worse = -change if result['higher_is_better'] else change
+        flag = ''
+        if worse > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        lines.append('%-40s %12.1f %-8s %+7.1f%%%s'
+                     % (name, result['value'], result['unit'], 100 * change, flag))
+    return lines, regressions
+
+def print_results(report):
+    for name, result in report['results'].items():
+        print('%-40s %12.1f %s' % (name, result['value'], result['unit']))
+
+def main():
+    parser = argparse.ArgumentParser(description='Snake game benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    horde = commands.add_parser('horde', help='ticks per second as the enemy count grows')
+    horde.add_argument('--size', type=int, default=100)
+    horde.add_argument('--enemies', type=int, nargs='+', default=[1, 10, 50, 100, 200])
+    horde.add_argument('--brain', choices=ENEMY_BRAINS, default='flow')
+    horde.add_argument('--seconds', type=float, default=2.0)
+
+    vector = commands.add_parser('vector', help='game ticks per second of VectorSnakeEnv')
+    vector.add_argument('--games', type=int, default=4096)
+    vector.add_argument('--size', type=int, default=30)
+    vector.add_argument('--steps', type=int, default=500)
+
+    replay = commands.add_parser('replay', help='size of replays and how fast they are checked')
+    replay.add_argument('--games', type=int, default=10000)
+    replay.add_argument('--brain', choices=ENEMY_BRAINS, default='greedy')
+    replay.add_argument('--enemies', type=int, default=1)
+
+    archive = commands.add_parser('archive', help='listing and seeking in a replay archive')
+    archive.add_argument('--games', type=int, default=20000)
+    archive.add_argument('--path', default='bench.snka')
+
+    autopilot = commands.add_parser('autopilot', help='decisions per second of the autopilot')
+    autopilot.add_argument('--games', type=int, default=20)
+    autopilot.add_argument('--sizes', type=int, nargs='+', default=[30, 100, 300])
+    autopilot.add_argument('--enemies', type=int, default=1)
+    autopilot.add_argument('--brain', choices=ENEMY_BRAINS, default='greedy')
+    autopilot.add_argument('--budget', type=float, default=AUTOPILOT_BUDGET,
+                           help='seconds the autopilot may search per tick')
+
+    clone = commands.add_parser('clone', help='snapshots, restores and clones per second')
+    clone.add_argument('--sizes', type=int, nargs='+', default=[30, 100, 300])
+    clone.add_argument('--brain', choices=ENEMY_BRAINS, default='greedy')
+    clone.add_argument('--enemies', type=int, default=1)
+    clone.add_argument('--seconds', type=float, default=0.5)
+
+    memory = commands.add_parser('memory', help='bytes kept per headless game')
+    memory.add_argument('--games', type=int, default=1000)
+    memory.add_argument('--sizes', type=int, nargs='+', default=[30, 100])
+    memory.add_argument('--enemies', type=int, default=1)
+    memory.add_argument('--ticks', type=int, default=300)
+
+    suite = commands.add_parser('suite', help='time every hot path, as JSON')
+    suite.add_argument('--seconds', type=float, default=0.6, help='time spent on each result')
+    suite.add_argument('--only', nargs='+', choices=SUITE_SECTIONS, default=SUITE_SECTIONS)
+    suite.add_argument('--out', help='write the results to this JSON file')
+    suite.add_argument('--baseline', help='compare with the results in this JSON file')
+    suite.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+
+    compare = commands.add_parser('compare', help='compare two saved suite results')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+
+    args = parser.parse_args()
+    if args.command == 'horde':
+        bench_horde(args.size, args.enemies, args.brain, args.seconds)
+    elif args.command == 'vector':
+        bench_vector(args.games, args.size, args.steps)
+    elif args.command == 'replay':
+        bench_replay(args.games, args.brain, args.enemies)
+    elif args.command == 'archive':
+        bench_archive(args.games, args.path)
+    elif args.command == 'autopilot':
+        bench_autopilot(args.games, args.sizes, args.enemies, args.brain, args.budget)
+    elif args.command == 'clone':
+        bench_clone(args.sizes, args.brain, args.enemies, args.seconds)
+    elif args.command == 'memory':
+        bench_memory(args.games, args.sizes, args.enemies, args.ticks)
+    elif args.command in ('suite', 'compare'):
+        if args.command == 'suite':
+            current = run_suite(args.seconds, args.only)
+            if args.out:
+                with open(args.out, 'w') as f:
+                    json.dump(current, f, indent=2)
+            if not args.baseline:
+                print_results(current)
+                return
+            baseline_path = args.baseline
+        else:
+            with open(args.current) as f:
+                current = json.load(f)
+            baseline_path = args.baseline
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        lines, regressions = compare_results(baseline, current, args.threshold)
+        print('\n'.join(lines))
+        if regressions:
+            print('%d regressions over %.0f%%' % (len(regressions), 100 * args.threshold))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,719 @@
+import random
+import struct
+from array import array
+from collections import deque
+
+# Game rules shared by the pygame front end and headless runs.
+# Nothing in this module may import pygame.
+GRID_COUNT = 30
+WIN_SCORE = 10
+INPUT_QUEUE_SIZE = 3  # Turns that can be buffered ahead of the next ticks
+
+# Directions. Entities keep a direction as its code, an index into
+# DIRECTIONS; the vectors are shared and must not be changed.
+UP = [0, -1]
+DOWN = [0, 1]
+LEFT = [-1, 0]
+RIGHT = [1, 0]
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+UP_CODE, DOWN_CODE, LEFT_CODE, RIGHT_CODE = range(4)
+OPPOSITE = (DOWN_CODE, UP_CODE, RIGHT_CODE, LEFT_CODE)
+
+# Eye positions relative to the head centre, for each direction
+EYES_OFFSETS = {
+    (1, 0): [(4, -3), (4, 3)],     # Right
+    (-1, 0): [(-4, -3), (-4, 3)],  # Left
+    (0, 1): [(-3, 4), (3, 4)],     # Down
+    (0, -1): [(-3, -4), (3, -4)],  # Up
+}
+EYES_BY_CODE = tuple(EYES_OFFSETS[tuple(direction)] for direction in DIRECTIONS)
+
+def direction_code(direction):
+    # Code of a direction vector, without building anything
+    dx, dy = direction
+    if dx:
+        return RIGHT_CODE if dx > 0 else LEFT_CODE
+    return DOWN_CODE if dy > 0 else UP_CODE
+
+# What ended a lost game (GameState.death)
+WALL = 'wall'
+SELF = 'self'
+CAUGHT = 'enemy'
+DEATHS = (None, WALL, SELF, CAUGHT)  # None while the game is not lost
+
+# GameState.snapshot() header: size, enemy count, seed, score, ticks,
+# game_over, victory, index into DEATHS, grow, food cell
+SNAPSHOT = struct.Struct('<IIQIIBBBBI')
+NO_FOOD = 0xFFFFFFFF  # Stands in for food_pos None in snapshots
+
+def cell_typecode(size):
+    # Smallest array type that holds every cell index of the board
+    return 'H' if size * size < 0x10000 else 'I'
+
+# The free_rows tree of an empty board, per board size, for Occupancy.clear()
+EMPTY_ROWS = {}
+
+# Occupancy flags, one bit per kind of entity so they can overlap
+PLAYER = 1
+ENEMY = 2
+
+def free_row_tree(cells, size):
+    # Fenwick tree of the empty cells in each row of a board. Rows count
+    # from 1 here: entry i sums the empty cells of the (i & -i) rows that
+    # end with row i, and entry 0 is unused.
+    tree = array('I', [0]) * (size + 1)
+    for row in range(1, size + 1):
+        tree[row] += cells.count(0, (row - 1) * size, row * size)
+        parent = row + (row & -row)
+        if parent <= size:
+            tree[parent] += tree[row]
+    return tree
+
+class Occupancy:
+    # GRID_COUNT x GRID_COUNT bytearray shared by every snake on the board.
+    # Each cell holds the OR of the flags of whatever is on it, so collision
+    # checks are a single index instead of a scan over a body list.
+    #
+    # Empty cells are counted (free_cells) and, per row, kept in a Fenwick
+    # tree (free_rows). Picking the n-th empty cell in cell order then walks
+    # down the tree to its row instead of scanning the board, so a random
+    # empty cell costs O(log size) and depends only on what is on the board
+    # and the generator, never on the order cells were taken and given back.
+    # A change to the board only notes its row (stale_rows); update_rows()
+    # recounts those rows and brings the tree up to date before a pick, so
+    # a row a snake crosses many times between picks is updated once.
+    #
+    # Enemies never share a cell, so enemy_ids records which enemy, if any,
+    # is on each cell.
+    #
+    # Cells are packed as y * size + x. The *_cell methods take packed
+    # cells; the others take (x, y) positions.
+    #
+    # copy() shares all of these with the copy until either board changes
+    # (copy on write), so a copy costs the same on any size of board.
+    def __init__(self, size=GRID_COUNT):
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        # Empties the board
+        size = self.size
+        empty_rows = EMPTY_ROWS.get(size)
+        if empty_rows is None:
+            empty_rows = EMPTY_ROWS[size] = free_row_tree(bytearray(size * size), size)
+        self.cells = bytearray(size * size)
+        self.free_cells = size * size
+        self.free_rows = empty_rows[:]
+        self.row_free = array('I', [size]) * size  # As counted in free_rows
+        self.stale_rows = set()
+        self.enemy_ids = array('i', [-1]) * (size * size)
+        self.shared = False
+
+    def copy(self):
+        other = Occupancy.__new__(Occupancy)
+        other.size = self.size
+        other.cells = self.cells
+        other.free_cells = self.free_cells
+        other.free_rows = self.free_rows
+        other.row_free = self.row_free
+        other.stale_rows = self.stale_rows
+        other.enemy_ids = self.enemy_ids
+        self.shared = other.shared = True
+        return other
+
+    def unshare(self):
+        # Takes private copies of the arrays before the first change after
+        # copy(). Whichever board changes first copies; the other may copy
+        # once more than it needs to, which is harmless.
+        self.cells = bytearray(self.cells)
+        self.free_rows = self.free_rows[:]
+        self.row_free = self.row_free[:]
+        self.stale_rows = set(self.stale_rows)
+        self.enemy_ids = self.enemy_ids[:]
+        self.shared = False
+
+    def add(self, pos, flag, enemy_id=-1):
+        self.add_cell(pos[1] * self.size + pos[0], flag, enemy_id)
+
+    def add_cell(self, index, flag, enemy_id=-1):
+        if self.shared:
+            self.unshare()
+        if flag == ENEMY:
+            self.enemy_ids[index] = enemy_id
+        cells = self.cells
+        if not cells[index]:
+            self.free_cells -= 1
+            self.stale_rows.add(index // self.size)
+        cells[index] |= flag
+
+    def remove(self, pos, flag):
+        self.remove_cell(pos[1] * self.size + pos[0], flag)
+
+    def remove_cell(self, index, flag):
+        if self.shared:
+            self.unshare()
+        if flag == ENEMY:
+            self.enemy_ids[index] = -1
+        cells = self.cells
+        if cells[index] & flag:
+            cells[index] &= ~flag
+            if not cells[index]:
+                self.free_cells += 1
+                self.stale_rows.add(index // self.size)
+
+    def occupied(self, pos, flags=PLAYER | ENEMY):
+        return self.cells[pos[1] * self.size + pos[0]] & flags != 0
+
+    def enemy_at(self, pos):
+        # Index of the enemy on pos, or None
+        enemy_id = self.enemy_ids[pos[1] * self.size + pos[0]]
+        return enemy_id if enemy_id >= 0 else None
+
+    def free_count(self):
+        return self.free_cells
+
+    def update_rows(self):
+        # Recounts the rows changed since the last call into free_rows
+        if not self.stale_rows:
+            return
+        if self.shared:
+            self.unshare()
+        cells = self.cells
+        size = self.size
+        tree = self.free_rows
+        counts = self.row_free
+        for row in self.stale_rows:
+            count = cells.count(0, row * size, row * size + size)
+            delta = count - counts[row]
+            if delta:
+                counts[row] = count
+                row += 1
+                while row <= size:
+                    tree[row] += delta
+                    row += row & -row
+        self.stale_rows.clear()
+
+    def nth_free_cell(self, n):
+        # The n-th empty cell counting in cell order. Walking down the tree
+        # skips whole rows; within the row, the range counted is halved
+        # until it is short, then its empty cells are stepped through.
+        self.update_rows()
+        tree = self.free_rows
+        size = self.size
+        row = 0
+        step = 1 << (size.bit_length() - 1)
+        while step:
+            after = row + step
+            if after <= size and tree[after] <= n:
+                row = after
+                n -= tree[after]
+            step >>= 1
+        cells = self.cells
+        start = row * size
+        end = start + size
+        while end - start > 16:
+            middle = (start + end) // 2
+            empty = cells.count(0, start, middle)
+            if n < empty:
+                end = middle
+            else:
+                n -= empty
+                start = middle
+        index = cells.find(0, start)
+        for _ in range(n):
+            index = cells.find(0, index + 1)
+        return index
+
+    def random_free_cell(self, rng=random):
+        # Returns None when the board is full
+        if not self.free_cells:
+            return None
+        return self.nth_free_cell(rng.randrange(self.free_cells))
+
+    def random_free(self, rng=random):
+        index = self.random_free_cell(rng)
+        return None if index is None else (index % self.size, index // self.size)
+
+    def random_free_cells(self, count, rng=random):
+        # Up to count distinct empty cells; fewer if the board is nearly full
+        picked = [self.nth_free_cell(n)
+                  for n in rng.sample(range(self.free_cells), min(count, self.free_cells))]
+        return [(index % self.size, index // self.size) for index in picked]
+
+class BodyView:
+    # A snake's packed cells as (x, y) positions, head first, for code that
+    # wants positions. Nothing is copied: each position is made when read.
+    __slots__ = ('cells', 'size')
+
+    def __init__(self, cells, size):
+        self.cells = cells
+        self.size = size
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __getitem__(self, i):
+        cell = self.cells[i]
+        return (cell % self.size, cell // self.size)
+
+    def __iter__(self):
+        size = self.size
+        return ((cell % size, cell // size) for cell in self.cells)
+
+    def __reversed__(self):
+        size = self.size
+        return ((cell % size, cell // size) for cell in reversed(self.cells))
+
+class Snake:
+    # The player's snake. cells is a deque of packed cells, head first, and
+    # code the direction it is heading in; body, direction and eyes_offset
+    # show the same as positions and vectors.
+    __slots__ = ('occupancy', 'size', 'start', 'cells', 'body', 'code', 'grow')
+    flag = PLAYER
+
+    def __init__(self, occupancy=None, start=None):
+        # start defaults to the middle of the board
+        self.occupancy = occupancy if occupancy is not None else Occupancy()
+        self.size = self.occupancy.size
+        self.start = start
+        self.cells = deque()
+        self.body = BodyView(self.cells, self.size)
+        self.reset()
+
+    def reset(self):
+        cells = self.cells
+        for cell in cells:
+            self.occupancy.remove_cell(cell, self.flag)
+        cells.clear()
+        size = self.size
+        x, y = self.start or (size//2, size//2)
+        cells.append(y * size + x)
+        self.occupancy.add_cell(cells[0], self.flag)
+        self.code = RIGHT_CODE
+        self.grow = False
+
+    @property
+    def direction(self):
+        return DIRECTIONS[self.code]
+
+    @direction.setter
+    def direction(self, direction):
+        self.code = direction_code(direction)
+
+    @property
+    def eyes_offset(self):
+        # Relative to head position
+        return EYES_BY_CODE[self.code]
+
+    def move(self):
+        cells = self.cells
+        head = cells[0]
+        size = self.size
+        dx, dy = DIRECTIONS[self.code]
+        x = head % size + dx
+        y = head // size + dy
+
+        # Check if snake hits the wall
+        if x < 0 or x >= size or y < 0 or y >= size:
+            return False
+
+        # Check if snake hits itself. The tail still counts here: it only
+        # vacates its cell once the head has moved in.
+        new_head = y * size + x
+        occupancy = self.occupancy
+        if occupancy.cells[new_head] & PLAYER:
+            return False
+
+        cells.appendleft(new_head)
+        occupancy.add_cell(new_head, PLAYER)
+        if not self.grow:
+            occupancy.remove_cell(cells.pop(), PLAYER)
+        else:
+            self.grow = False
+        return True
+
+    @classmethod
+    def empty(cls, occupancy):
+        # A snake with no cells on the board yet, for callers that place it
+        # later with reset()
+        snake = cls.__new__(cls)
+        snake.occupancy = occupancy
+        snake.size = occupancy.size
+        snake.start = None
+        snake.cells = deque()
+        snake.body = BodyView(snake.cells, snake.size)
+        snake.code = RIGHT_CODE
+        snake.grow = False
+        return snake
+
+    def copy(self, occupancy):
+        # The same snake on the board of a cloned game
+        snake = Snake.__new__(Snake)
+        snake.occupancy = occupancy
+        snake.size = self.size
+        snake.start = self.start
+        snake.cells = deque(self.cells)
+        snake.body = BodyView(snake.cells, self.size)
+        snake.code = self.code
+        snake.grow = self.grow
+        return snake
+
+    def change_direction(self, new_direction):
+        self.turn(direction_code(new_direction))
+
+    def turn(self, code):
+        # Prevent 180-degree turns
+        if code != OPPOSITE[self.code]:
+            self.code = code
+
+class EnemySnake:
+    # Packed cells and a direction code, like Snake
+    __slots__ = ('occupancy', 'size', 'brain', 'start', 'enemy_id', 'cells', 'body', 'code',
+                 'move_every', 'move_counter')
+    flag = ENEMY
+
+    def __init__(self, occupancy=None, brain=None, start=(0, 0), enemy_id=0):
+        # Without a brain the enemy uses the original straight-line chase;
+        # see snake_ai for path-finding brains
+        self.occupancy = occupancy if occupancy is not None else Occupancy()
+        self.size = self.occupancy.size
+        self.brain = brain
+        self.start = start
+        self.enemy_id = enemy_id
+        self.cells = deque()
+        self.body = BodyView(self.cells, self.size)
+        self.reset()
+
+    def reset(self):
+        cells = self.cells
+        for cell in cells:
+            self.occupancy.remove_cell(cell, self.flag)
+        if self.brain is not None:
+            self.brain.reset()
+        # Start enemy snake in opposite corner from player
+        cells.clear()
+        cells.append(self.start[1] * self.size + self.start[0])
+        self.occupancy.add_cell(cells[0], self.flag, self.enemy_id)
+        self.code = RIGHT_CODE
+        self.move_every = 2  # Moves every other tick
+        self.move_counter = 0
+
+    @property
+    def direction(self):
+        return DIRECTIONS[self.code]
+
+    def copy(self, occupancy, brain):
+        # Like Snake.copy(), with brain a copy of this enemy's brain
+        enemy = EnemySnake.__new__(EnemySnake)
+        enemy.occupancy = occupancy
+        enemy.size = self.size
+        enemy.brain = brain
+        enemy.start = self.start
+        enemy.enemy_id = self.enemy_id
+        enemy.cells = deque(self.cells)
+        enemy.body = BodyView(enemy.cells, self.size)
+        enemy.code = self.code
+        enemy.move_every = self.move_every
+        enemy.move_counter = self.move_counter
+        return enemy
+
+    def move(self, player_head):
+        # player_head is a packed cell
+        self.move_counter += 1
+        if self.move_counter < self.move_every:
+            return True
+
+        self.move_counter = 0
+        cells = self.cells
+        head = cells[0]
+        size = self.size
+
+        if self.brain is not None:
+            direction = self.brain.choose_direction((head % size, head // size),
+                                                    (player_head % size, player_head // size),
+                                                    self.occupancy)
+            if direction is None:
+                # Boxed in, wait for a way out
+                return True
+            code = direction_code(direction)
+        else:
+            # Calculate direction to player
+            dx = player_head % size - head % size
+            dy = player_head // size - head // size
+
+            # Choose horizontal or vertical movement based on larger difference
+            if abs(dx) > abs(dy):
+                code = RIGHT_CODE if dx > 0 else LEFT_CODE
+            else:
+                code = DOWN_CODE if dy > 0 else UP_CODE
+
+        self.code = code
+        dx, dy = DIRECTIONS[code]
+        x = head % size + dx
+        y = head // size + dy
+
+        # Check if enemy hits the wall
+        if x < 0 or x >= size or y < 0 or y >= size:
+            return False
+
+        # Another enemy is in the way, wait for it to move on
+        new_head = y * size + x
+        occupancy = self.occupancy
+        if occupancy.cells[new_head] & ENEMY:
+            return True
+
+        cells.appendleft(new_head)
+        occupancy.add_cell(new_head, ENEMY, self.enemy_id)
+        occupancy.remove_cell(cells.pop(), ENEMY)
+        return True
+
+def enemy_starts(size, count):
+    # Spread the enemies evenly around the edge of the board, starting in
+    # the top-left corner, then around the next ring in if they do not fit
+    cells = []
+    for ring in range(size // 2):
+        last = size - 1 - ring
+        edge = ([(x, ring) for x in range(ring, last)] +
+                [(last, y) for y in range(ring, last)] +
+                [(x, last) for x in range(last, ring, -1)] +
+                [(ring, y) for y in range(last, ring, -1)])
+        cells.append(edge)
+    starts = []
+    for edge in cells:
+        wanted = count - len(starts)
+        if wanted <= 0:
+            break
+        if wanted >= len(edge):
+            starts.extend(edge)
+        else:
+            starts.extend(edge[i * len(edge) // wanted] for i in range(wanted))
+    return starts
+
+class GameState:
+    # Everything one game needs, stepped one tick at a time.
+    # There is no clock in here: callers decide how fast to call step().
+    #
+    # enemy_brains has one entry per enemy (see snake_ai.make_enemy_brains);
+    # by default there is a single enemy with the original chase.
+    #
+    # All randomness comes from self.rng, which is seeded afresh from the
+    # game's seed and the score before each food is placed. A game can be
+    # played again exactly from self.seed and its inputs (see snake_replay),
+    # and snapshot() has no generator state to save.
+    def __init__(self, enemy_brains=None, size=GRID_COUNT, seed=None):
+        if enemy_brains is None:
+            enemy_brains = [None]
+        self.size = size
+        self.occupancy = Occupancy(size)
+        # The player is placed first so the enemies can be kept off it
+        self.snake = Snake(self.occupancy)
+        starts = [pos for pos in enemy_starts(size, len(enemy_brains) + 1)
+                  if pos != self.snake.body[0]]
+        self.enemies = [EnemySnake(self.occupancy, brain, start, i)
+                        for i, (brain, start) in enumerate(zip(enemy_brains, starts))]
+        self.rng = random.Random()
+        self.reset(seed)
+
+    @property
+    def enemy_snake(self):
+        return self.enemies[0]
+
+    def reset(self, seed=None):
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.occupancy.clear()
+        self.snake.reset()
+        for enemy in self.enemies:
+            enemy.reset()
+        self.input_queue = deque()  # Direction codes
+        self.score = 0
+        self.place_food()
+        self.ticks = 0
+        self.game_over = False
+        self.victory = False
+        self.death = None
+
+    def place_food(self):
+        self.rng.seed((self.score << 64) | self.seed)
+        cell = self.occupancy.random_free_cell(self.rng)
+        self.food_cell = NO_FOOD if cell is None else cell
+
+    @property
+    def food_pos(self):
+        # food_cell as a position, or None
+        cell = self.food_cell
+        return None if cell == NO_FOOD else (cell % self.size, cell // self.size)
+
+    @food_pos.setter
+    def food_pos(self, pos):
+        self.food_cell = NO_FOOD if pos is None else pos[1] * self.size + pos[0]
+
+    @property
+    def done(self):
+        return self.game_over or self.victory
+
+    def change_direction(self, direction):
+        self.snake.change_direction(direction)
+
+    def queue_direction(self, direction):
+        # Buffer a turn for a later tick, so two quick key presses inside
+        # one tick become two turns instead of the second overriding the first.
+        # Repeats and reversals of the last queued turn are dropped.
+        code = direction_code(direction)
+        last = self.input_queue[-1] if self.input_queue else self.snake.code
+        if code == last or code == OPPOSITE[last]:
+            return
+        if len(self.input_queue) < INPUT_QUEUE_SIZE:
+            self.input_queue.append(code)
+
+    def step(self, action=None):
+        # Advance the game by one tick. Returns False once the game has ended.
+        # Without an explicit action the next queued turn, if any, is used.
+        if self.done:
+            return False
+        snake = self.snake
+        if action is not None:
+            snake.turn(direction_code(action))
+        elif self.input_queue:
+            snake.turn(self.input_queue.popleft())
+
+        # Move snake and check for collisions
+        if not snake.move():
+            size = self.size
+            head = snake.cells[0]
+            dx, dy = DIRECTIONS[snake.code]
+            x = head % size + dx
+            y = head // size + dy
+            inside = 0 <= x < size and 0 <= y < size
+            self.lose(SELF if inside else WALL)
+
+        # Move enemy snakes, all in one pass against the same player head.
+        # An enemy running into a wall also ends the game, as it always has.
+        player_head = snake.cells[0]
+        for enemy in self.enemies:
+            if not enemy.move(player_head):
+                self.lose(CAUGHT)
+
+        # Check if enemy caught the player
+        if self.occupancy.cells[player_head] & ENEMY:
+            self.lose(CAUGHT)
+
+        # Check for food collision
+        if player_head == self.food_cell:
+            snake.grow = True
+            self.score += 1
+
+            # Check for victory
+            if self.score >= WIN_SCORE:
+                self.victory = True
+            else:
+                self.place_food()
+                # Nowhere left to put food: the board is full, which is a win
+                if self.food_cell == NO_FOOD:
+                    self.victory = True
+
+        self.ticks += 1
+        return not self.done
+
+    def clone(self):
+        # An independent copy of the game, for undo, rollback or searching
+        # ahead. Much cheaper than copy.deepcopy() or a snapshot() and
+        # restore(): the board is shared copy-on-write (see Occupancy), so
+        # only the snakes are copied straight away.
+        #
+        # Brains are copied with brain.clone(memo), where memo maps objects
+        # that brains share, such as a flow field, to their copies.
+        game = GameState.__new__(GameState)
+        # Every plain value at once; rng is reseeded before each use, so
+        # both games can draw from it
+        game.__dict__.update(self.__dict__)
+        game.occupancy = occupancy = self.occupancy.copy()
+        game.snake = self.snake.copy(occupancy)
+        memo = {}
+        game.enemies = [enemy.copy(occupancy,
+                                   None if enemy.brain is None else enemy.brain.clone(memo))
+                        for enemy in self.enemies]
+        game.input_queue = deque(self.input_queue)
+        return game
+
+    def lose(self, death):
+        # The first thing to end the game in a tick is what gets the blame
+        if not self.game_over:
+            self.game_over = True
+            self.death = death
+
+    # Snapshots hold everything step() depends on. The board is rebuilt from
+    # the bodies, so a snapshot grows with the snakes and not with the
+    # board. After a SNAPSHOT header
+    # (size, enemy count, seed, score, ticks, game_over, victory, index into
+    # DEATHS, grow, food cell) comes an array of 16-bit values, or 32-bit on
+    # boards of 65536 cells or more:
+    #
+    #     player direction, queued turns, player body,
+    #     per enemy: direction, move counter, body, brain memory
+    #
+    # where every list is its length followed by its items, cells are
+    # y * size + x and directions are indexes into DIRECTIONS.
+    def snapshot(self):
+        size = self.size
+        snake = self.snake
+        header = SNAPSHOT.pack(size, len(self.enemies), self.seed, self.score, self.ticks,
+                               self.game_over, self.victory, DEATHS.index(self.death),
+                               snake.grow, self.food_cell)
+        values = array(cell_typecode(size))
+        values.append(snake.code)
+        values.append(len(self.input_queue))
+        values.extend(self.input_queue)
+        values.append(len(snake.cells))
+        values.extend(snake.cells)
+        for enemy in self.enemies:
+            values.extend((enemy.code, enemy.move_counter, len(enemy.cells)))
+            values.extend(enemy.cells)
+            memory = enemy.brain.saved_cells() if enemy.brain is not None else []
+            values.append(len(memory))
+            values.extend([y * size + x for x, y in memory])
+        return header + values.tobytes()
+
+    def restore(self, data):
+        # Puts the game back in the state snapshot() saved. The game must
+        # have the same board size, enemies and brains as the one saved.
+        (size, enemies, self.seed, self.score, self.ticks, game_over, victory, death,
+         grow, food) = SNAPSHOT.unpack_from(data)
+        if size != self.size or enemies != len(self.enemies):
+            raise ValueError('snapshot is of a %dx%d board with %d enemies'
+                             % (size, size, enemies))
+        self.game_over = bool(game_over)
+        self.victory = bool(victory)
+        self.death = DEATHS[death]
+        self.food_cell = food
+        values = array(cell_typecode(size))
+        values.frombytes(data[SNAPSHOT.size:])
+        position = 0
+
+        def take(count):
+            nonlocal position
+            position += count
+            return values[position - count:position]
+
+        def cells(count):
+            return [(index % size, index // size) for index in take(count)]
+
+        occupancy = self.occupancy
+        occupancy.clear()
+        snake = self.snake
+        snake.code = take(1)[0]
+        snake.grow = bool(grow)
+        self.input_queue = deque(take(take(1)[0]))
+        snake.cells.clear()
+        snake.cells.extend(take(take(1)[0]))
+        for cell in snake.cells:
+            occupancy.add_cell(cell, PLAYER)
+        for enemy in self.enemies:
+            enemy.code, enemy.move_counter, length = take(3)
+            enemy.cells.clear()
+            enemy.cells.extend(take(length))
+            for cell in enemy.cells:
+                occupancy.add_cell(cell, ENEMY, enemy.enemy_id)
+            memory = cells(take(1)[0])
+            if enemy.brain is not None:
+                enemy.brain.reset()
+                enemy.brain.restore_cells(memory)
@@ -1,16 +1,43 @@
+import time
+STARTED = time.perf_counter()  # Before anything else, for time-to-first-frame
+
+import argparse
 import pygame
 import random
+import os
 import sys
 import math
+import functools
+
+import numpy as np
 
-# Initialize Pygame
-pygame.init()
+from snake_engine import (GRID_COUNT, UP, DOWN, LEFT, RIGHT, EYES_OFFSETS, PLAYER,
+                          ENEMY, GameState)
+from snake_ai import Autopilot, make_enemy_brains
+from snake_replay import ReplayRecorder
+from snake_profiler import PHASES, FrameProfiler
 
 # Constants
 WINDOW_SIZE = 600
-GRID_SIZE = 20
-GRID_COUNT = WINDOW_SIZE // GRID_SIZE
-GAME_SPEED = 15
+GRID_SIZE = WINDOW_SIZE // GRID_COUNT  # Pixels per cell, unless main() is told otherwise
+MIN_CELL_SIZE = 2  # Bigger boards scroll instead of shrinking further
+LOD_CELL_SIZE = 8  # Smaller cells are drawn as flat colours by default
+GAME_SPEED = 15  # Game ticks per second
+FRAME_RATE = 60  # Frames drawn per second, independent of GAME_SPEED
+MAX_TICKS_PER_FRAME = 5  # After a stall, drop ticks beyond this instead of catching up
+DIRTY_RECT_RENDERING = True  # Redraw only the cells that changed each tick
+INTERPOLATE = False  # Slide the snake's head smoothly between cells
+ENEMY_AI = 'greedy'  # How the enemy hunts you: 'greedy', 'astar' or 'flow'
+ENEMY_COUNT = 1
+REPLAY_DIR = 'replays'  # Every finished game is saved here; None to turn off
+PROFILER_KEY = pygame.K_F3  # Shows frame timings per phase
+ALLOCATIONS_KEY = pygame.K_F4  # Counts allocations too, which slows the game down
+DUMP_KEY = pygame.K_F5  # Saves the last few seconds of timings to PROFILE_DUMP
+PROFILE_DUMP = 'frame_times.csv'
+PROFILE_CSV = None  # Set to a file name to save the timings of every frame
+PROFILER_REFRESH = 15  # Frames between updates of the timings overlay
+AUTOPILOT_KEY = pygame.K_a  # Lets the autopilot steer during a game
+ATTRACT_DELAY = 20  # Seconds on the title screen before a demo game; None to turn off
 
 # Colors
 BLACK = (0, 0, 0)
@@ -29,170 +56,221 @@ WHITE = (255, 255, 255)
 GRAY = (128, 128, 128)
 GOLD = (255, 215, 0)
 
-# Initialize the game window
-screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE))
-pygame.display.set_caption('Snake Game')
-clock = pygame.time.Clock()
-
-# Initialize fonts
-title_font = pygame.font.Font(None, 74)
-font = pygame.font.Font(None, 36)
-title_font = pygame.font.Font(None, 100)  # Bigger font for title
-subtitle_font = pygame.font.Font(None, 36)
-game_font = pygame.font.Font(None, 36)
-small_font = pygame.font.Font(None, 24)
-
-class Snake:
-    def __init__(self):
-        self.reset()
-
-    def reset(self):
-        self.body = [(GRID_COUNT//2, GRID_COUNT//2)]
-        self.direction = [1, 0]
-        self.grow = False
-        self.eyes_offset = [(4, -3), (4, 3)]  # Relative to head position
-
-    def move(self):
-        head = self.body[0]
-        new_head = (head[0] + self.direction[0], head[1] + self.direction[1])
-        
-        # Check if snake hits the wall
-        if (new_head[0] < 0 or new_head[0] >= GRID_COUNT or 
-            new_head[1] < 0 or new_head[1] >= GRID_COUNT):
-            return False
-        
-        # Check if snake hits itself
-        if new_head in self.body[1:]:
-            return False
-            
-        self.body.insert(0, new_head)
-        if not self.grow:
-            self.body.pop()
-        else:
-            self.grow = False
-        return True
-
-    def change_direction(self, new_direction):
-        # Prevent 180-degree turns
-        if (self.direction[0] + new_direction[0] != 0 or 
-            self.direction[1] + new_direction[1] != 0):
-            self.direction = new_direction
-            # Update eyes offset based on direction
-            if new_direction == [1, 0]:  # Right
-                self.eyes_offset = [(4, -3), (4, 3)]
-            elif new_direction == [-1, 0]:  # Left
-                self.eyes_offset = [(-4, -3), (-4, 3)]
-            elif new_direction == [0, 1]:  # Down
-                self.eyes_offset = [(-3, 4), (3, 4)]
-            elif new_direction == [0, -1]:  # Up
-                self.eyes_offset = [(-3, -4), (3, -4)]
-
-class EnemySnake:
-    def __init__(self):
-        self.reset()
-
-    def reset(self):
-        # Start enemy snake in opposite corner from player
-        self.body = [(0, 0)]
-        self.direction = [1, 0]
-        self.speed = 0.5  # Moves every other frame
-        self.move_counter = 0
-
-    def move(self, player_head):
-        self.move_counter += self.speed
-        if self.move_counter < 1:
-            return True
-        
-        self.move_counter = 0
-        head = self.body[0]
-        
-        # Calculate direction to player
-        dx = player_head[0] - head[0]
-        dy = player_head[1] - head[1]
-        
-        # Choose horizontal or vertical movement based on larger difference
-        if abs(dx) > abs(dy):
-            new_direction = [1 if dx > 0 else -1, 0]
-        else:
-            new_direction = [0, 1 if dy > 0 else -1]
-        
-        self.direction = new_direction
-        new_head = (head[0] + self.direction[0], head[1] + self.direction[1])
-        
-        # Check if enemy hits the wall
-        if (new_head[0] < 0 or new_head[0] >= GRID_COUNT or 
-            new_head[1] < 0 or new_head[1] >= GRID_COUNT):
-            return False
-            
-        self.body.insert(0, new_head)
-        self.body.pop()
-        return True
-
-def draw_snake_segment(screen, pos, snake_obj=None, is_head=False, segment_index=0):
-    x = pos[0] * GRID_SIZE
-    y = pos[1] * GRID_SIZE
-    segment_size = GRID_SIZE - 2
+# Flat cell colours for low-detail rendering, indexed by occupancy flags
+LOD_PALETTE = np.zeros((256, 3), np.uint8)
+LOD_PALETTE[0] = SOIL_BROWN
+LOD_PALETTE[PLAYER] = SNAKE_LIGHT
+LOD_PALETTE[ENEMY] = RED
+LOD_PALETTE[PLAYER | ENEMY] = RED
+LOD_HEAD = GREEN
+
+# Font sizes
+TITLE_FONT = 100
+TEXT_FONT = 36
+SMALL_FONT = 24
+
+# Nothing is initialised when this module is imported. The game only uses
+# the display and fonts, so audio and joysticks are never started.
+def init_display():
+    pygame.display.init()
+    screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE))
+    pygame.display.set_caption('Snake Game')
+    return screen
+
+@functools.lru_cache(maxsize=None)
+def get_font(size):
+    # One shared Font per size, loaded the first time it is drawn with
+    if not pygame.font.get_init():
+        pygame.font.init()
+    return pygame.font.Font(None, size)
+
+# Number of distinct colours the pulsing title subtitle cycles through
+PULSE_LEVELS = 16
+
+@functools.lru_cache(maxsize=256)
+def render_text(font, text, color, antialias=True):
+    # Most labels are drawn with the same arguments every frame, so keep the
+    # rendered surfaces around. Callers must not draw on the result.
+    return font.render(text, antialias, color)
+
+def quit_pygame():
+    # Fonts die with pygame, so the cached ones go too; otherwise a later
+    # main() in the same process would draw with them
+    get_font.cache_clear()
+    render_text.cache_clear()
+    pygame.quit()
+
+class BoardView:
+    # Which part of the board is on screen, and how many pixels a cell is.
+    # left and top are the board pixel at the window's top-left corner; they
+    # stay 0 unless the board is bigger than the window, in which case
+    # follow() keeps a cell in the middle, moving in whole cells.
+    def __init__(self, board_size=GRID_COUNT, cell=GRID_SIZE,
+                 width=WINDOW_SIZE, height=WINDOW_SIZE):
+        self.board_size = board_size
+        self.cell = cell
+        self.width = width
+        self.height = height
+        self.left = 0
+        self.top = 0
+        self.scrolls = board_size * cell > width or board_size * cell > height
+
+    def follow(self, pos):
+        cell = self.cell
+        board = self.board_size * cell
+        self.left = min(max(pos[0] * cell - self.width // 2, 0),
+                        max(board - self.width, 0)) // cell * cell
+        self.top = min(max(pos[1] * cell - self.height // 2, 0),
+                       max(board - self.height, 0)) // cell * cell
+
+    def visible(self):
+        # First and one-past-last cell column and row on screen
+        cell = self.cell
+        return (self.left // cell, self.top // cell,
+                min(-(-(self.left + self.width) // cell), self.board_size),
+                min(-(-(self.top + self.height) // cell), self.board_size))
+
+    def pixel(self, pos):
+        return (pos[0] * self.cell - self.left, pos[1] * self.cell - self.top)
+
+    def cell_rect(self, pos, margin=0):
+        x, y = self.pixel(pos)
+        return pygame.Rect(x - margin, y - margin,
+                           self.cell + margin * 2, self.cell + margin * 2)
+
+DEFAULT_VIEW = BoardView()
+
+# Pre-rendered snake tiles, built once per cell size by get_snake_sprites()
+snake_sprites = {}
+HEAD_PADDING = 4  # Eyes stick out of the head tile by a few pixels
+
+def head_padding(cell):
+    # Eye sizes and offsets are designed for GRID_SIZE cells and scaled
+    return max(1, round(HEAD_PADDING * cell / GRID_SIZE))
+
+def build_segment_tile(with_scales, cell=GRID_SIZE):
+    segment_size = cell - 2
     
     # Create gradient effect for snake body
-    gradient_rect = pygame.Surface((segment_size, segment_size))
+    tile = pygame.Surface((segment_size, segment_size))
     for i in range(segment_size):
         progress = i / segment_size
         color = [
             int(SNAKE_DARK[j] + (SNAKE_LIGHT[j] - SNAKE_DARK[j]) * progress)
             for j in range(3)
         ]
-        pygame.draw.line(gradient_rect, color, (i, 0), (i, segment_size))
+        pygame.draw.line(tile, color, (i, 0), (i, segment_size))
     
     # Add scale pattern every few segments
-    if segment_index % 2 == 0:
+    if with_scales:
         scale_height = segment_size // 3
-        pygame.draw.ellipse(gradient_rect, SNAKE_PATTERN,
+        pygame.draw.ellipse(tile, SNAKE_PATTERN,
                           (segment_size//4, 0, segment_size//2, scale_height))
+    return tile
+
+def build_head_sprite(tile, direction, cell=GRID_SIZE):
+    # Head tile plus eyes, on a transparent margin so the eyes can overhang
+    scale = cell / GRID_SIZE
+    padding = head_padding(cell)
+    size = cell + padding * 2
+    head = pygame.Surface((size, size), pygame.SRCALPHA)
+    head.blit(tile, (padding + 1, padding + 1))
     
-    # Apply the gradient surface
-    screen.blit(gradient_rect, (x + 1, y + 1))
+    # Draw larger, more detailed eyes
+    eye_size = max(1, round(6 * scale))
+    pupil_size = max(1, round(3 * scale))
+    center = padding + cell//2
+    eyes_offset = [(round(x * scale), round(y * scale)) for x, y in EYES_OFFSETS[direction]]
+    for offset_x, offset_y in eyes_offset:
+        eye_pos = (center + offset_x, center + offset_y)
+        pygame.draw.circle(head, EYE_COLOR, eye_pos, eye_size)
     
-    # Draw head details if this is the head
-    if is_head and snake_obj:
-        # Draw larger, more detailed eyes
-        eye_size = 6
-        pupil_size = 3
-        
-        # Calculate eye positions based on direction
-        eye_pos1 = (x + GRID_SIZE//2 + snake_obj.eyes_offset[0][0],
-                   y + GRID_SIZE//2 + snake_obj.eyes_offset[0][1])
-        eye_pos2 = (x + GRID_SIZE//2 + snake_obj.eyes_offset[1][0],
-                   y + GRID_SIZE//2 + snake_obj.eyes_offset[1][1])
-        
-        # Draw eye whites
-        pygame.draw.circle(screen, EYE_COLOR, eye_pos1, eye_size)
-        pygame.draw.circle(screen, EYE_COLOR, eye_pos2, eye_size)
-        
-        # Draw pupils (slightly offset based on movement direction)
-        pupil_offset_x = snake_obj.direction[0] * 2
-        pupil_offset_y = snake_obj.direction[1] * 2
-        pygame.draw.circle(screen, PUPIL_COLOR,
-                         (eye_pos1[0] + pupil_offset_x, eye_pos1[1] + pupil_offset_y),
-                         pupil_size)
-        pygame.draw.circle(screen, PUPIL_COLOR,
-                         (eye_pos2[0] + pupil_offset_x, eye_pos2[1] + pupil_offset_y),
-                         pupil_size)
+    # Draw pupils (slightly offset based on movement direction)
+    look = round(2 * scale)
+    for offset_x, offset_y in eyes_offset:
+        pupil_pos = (center + offset_x + direction[0] * look,
+                     center + offset_y + direction[1] * look)
+        pygame.draw.circle(head, PUPIL_COLOR, pupil_pos, pupil_size)
+    return head
+
+def get_snake_sprites(cell=GRID_SIZE):
+    # Built on first use: two body tiles (with and without the scale
+    # pattern) and one head per direction
+    sprites = snake_sprites.get(cell)
+    if sprites is None:
+        with_scales = build_segment_tile(True, cell)
+        sprites = {'even': with_scales, 'odd': build_segment_tile(False, cell)}
+        for direction in EYES_OFFSETS:
+            sprites[direction] = build_head_sprite(with_scales, direction, cell)
+        snake_sprites[cell] = sprites
+    return sprites
+
+def draw_tongue(screen, pos, direction, shift=(0, 0), view=DEFAULT_VIEW):
+    x, y = view.pixel(pos)
+    x += shift[0]
+    y += shift[1]
+    cell = view.cell
+    scale = cell / GRID_SIZE
+    length = round(8 * scale)
+    fork = round(4 * scale)
+    
+    # Draw flickering tongue
+    if pygame.time.get_ticks() % 1000 < 500:  # Tongue flicks every half second
+        tongue_start = (x + cell//2 + direction[0] * cell//2,
+                      y + cell//2 + direction[1] * cell//2)
+        tongue_end1 = (tongue_start[0] + direction[0] * length + direction[1] * fork,
+                      tongue_start[1] + direction[1] * length + direction[0] * fork)
+        tongue_end2 = (tongue_start[0] + direction[0] * length - direction[1] * fork,
+                      tongue_start[1] + direction[1] * length - direction[0] * fork)
         
-        # Draw flickering tongue
-        if pygame.time.get_ticks() % 1000 < 500:  # Tongue flicks every half second
-            tongue_start = (x + GRID_SIZE//2 + snake_obj.direction[0] * GRID_SIZE//2,
-                          y + GRID_SIZE//2 + snake_obj.direction[1] * GRID_SIZE//2)
-            tongue_end1 = (tongue_start[0] + snake_obj.direction[0] * 8 + snake_obj.direction[1] * 4,
-                          tongue_start[1] + snake_obj.direction[1] * 8 + snake_obj.direction[0] * 4)
-            tongue_end2 = (tongue_start[0] + snake_obj.direction[0] * 8 - snake_obj.direction[1] * 4,
-                          tongue_start[1] + snake_obj.direction[1] * 8 - snake_obj.direction[0] * 4)
-            
-            pygame.draw.line(screen, TONGUE_COLOR, tongue_start, tongue_end1, 2)
-            pygame.draw.line(screen, TONGUE_COLOR, tongue_start, tongue_end2, 2)
-
-def draw_enemy_snake(screen, pos):
-    x, y = pos[0] * GRID_SIZE, pos[1] * GRID_SIZE
-    segment_size = GRID_SIZE - 2
+        width = max(1, round(2 * scale))
+        pygame.draw.line(screen, TONGUE_COLOR, tongue_start, tongue_end1, width)
+        pygame.draw.line(screen, TONGUE_COLOR, tongue_start, tongue_end2, width)
+
+def draw_snake_segment(screen, pos, snake_obj=None, is_head=False, segment_index=0,
+                       view=DEFAULT_VIEW):
+    x, y = view.pixel(pos)
+    sprites = get_snake_sprites(view.cell)
+    
+    if is_head and snake_obj:
+        padding = head_padding(view.cell)
+        screen.blit(sprites[tuple(snake_obj.direction)], (x - padding, y - padding))
+        draw_tongue(screen, pos, snake_obj.direction, view=view)
+    else:
+        tile = sprites['even'] if segment_index % 2 == 0 else sprites['odd']
+        screen.blit(tile, (x + 1, y + 1))
+
+def draw_snake(screen, snake_obj, phase=0, head_shift=(0, 0), view=DEFAULT_VIEW):
+    # Whole snake in one blits() call; only the tongue is drawn per frame.
+    # phase is the number of moves made so far, so each segment keeps the
+    # same scale pattern as it travels instead of flickering every tick.
+    sprites = get_snake_sprites(view.cell)
+    tiles = (sprites['even'], sprites['odd'])
+    cell = view.cell
+    left = view.left - 1
+    top = view.top - 1
+    blits = [(tiles[(phase - i) & 1], (x * cell - left, y * cell - top))
+             for i, (x, y) in enumerate(snake_obj.body)]
+    blits[0] = head_blit(snake_obj, head_shift, view)
+    if head_shift != (0, 0):
+        # A sliding head has to stay on top of the cell it is leaving
+        blits.append(blits.pop(0))
+    screen.blits(blits, False)
+    draw_tongue(screen, snake_obj.body[0], snake_obj.direction, head_shift, view)
+
+def head_blit(snake_obj, shift=(0, 0), view=DEFAULT_VIEW):
+    x, y = view.pixel(snake_obj.body[0])
+    padding = head_padding(view.cell)
+    return (get_snake_sprites(view.cell)[tuple(snake_obj.direction)],
+            (x - padding + shift[0], y - padding + shift[1]))
+
+def draw_food_block(screen, pos, view=DEFAULT_VIEW):
+    x, y = view.pixel(pos)
+    pygame.draw.rect(screen, GOLD, (x, y, view.cell - 2, view.cell - 2))
+
+def draw_enemy_snake(screen, pos, view=DEFAULT_VIEW):
+    x, y = view.pixel(pos)
+    segment_size = view.cell - 2
 
     # Draw enemy snake segment with red color
     pygame.draw.rect(screen, DARK_RED, 
@@ -200,11 +278,11 @@ def draw_enemy_snake(screen, pos):
     pygame.draw.rect(screen, RED,
                     (x + 2, y + 2, segment_size - 4, segment_size - 4))
 
-def draw_food(screen, pos):
-    x, y = pos[0] * GRID_SIZE, pos[1] * GRID_SIZE
-    center_x = x + GRID_SIZE // 2
-    center_y = y + GRID_SIZE // 2
-    radius = GRID_SIZE // 2 - 2
+def draw_food(screen, pos, view=DEFAULT_VIEW):
+    x, y = view.pixel(pos)
+    center_x = x + view.cell // 2
+    center_y = y + view.cell // 2
+    radius = view.cell // 2 - 2
 
     # Draw apple body
     pygame.draw.circle(screen, DARK_RED, (center_x, center_y), radius)
@@ -225,16 +303,28 @@ def draw_food(screen, pos):
 
 def draw_game_over(screen, score):
     # Create semi-transparent overlay
-    overlay = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
-    overlay.fill(BLACK)
-    overlay.set_alpha(128)
-    screen.blit(overlay, (0, 0))
+    key = ('overlay', screen.get_size())
+    if key not in texture_cache:
+        overlay = pygame.Surface(screen.get_size())
+        overlay.fill(BLACK)
+        overlay.set_alpha(128)
+        texture_cache[key] = overlay
+    screen.blit(texture_cache[key], (0, 0))
+
+    # The text only depends on the score, so it is composed once per score
+    key = ('game_over', screen.get_size(), score)
+    if key not in texture_cache:
+        texture_cache[key] = build_game_over(screen.get_size(), score)
+    screen.blit(texture_cache[key], (0, 0))
+
+def build_game_over(size, score):
+    overlay = pygame.Surface(size, pygame.SRCALPHA)
 
     # Game Over text with shadow
-    game_over_text = title_font.render('Game Over!', True, GOLD)
-    score_text = font.render('Final Score: %d' % score, True, WHITE)
-    restart_text = font.render('Press SPACE to restart', True, WHITE)
-    high_score_text = small_font.render('Try to beat your high score!', True, GRAY)
+    game_over_text = render_text(get_font(TITLE_FONT), 'Game Over!', GOLD)
+    score_text = render_text(get_font(TEXT_FONT), 'Final Score: %d' % score, WHITE)
+    restart_text = render_text(get_font(TEXT_FONT), 'Press SPACE to restart', WHITE)
+    high_score_text = render_text(get_font(SMALL_FONT), 'Try to beat your high score!', GRAY)
     
     # Calculate positions
     center_y = WINDOW_SIZE // 2
@@ -244,17 +334,18 @@ def draw_game_over(screen, score):
     high_score_rect = high_score_text.get_rect(center=(WINDOW_SIZE//2, center_y + 100))
     
     # Draw text with decorative elements
-    pygame.draw.rect(screen, DARK_GREEN, 
+    pygame.draw.rect(overlay, DARK_GREEN, 
                     (game_over_rect.left - 20, game_over_rect.top - 20,
                      game_over_rect.width + 40, game_over_rect.height + 40), 2)
     
-    screen.blit(game_over_text, game_over_rect)
-    screen.blit(score_text, score_rect)
-    screen.blit(restart_text, restart_rect)
-    screen.blit(high_score_text, high_score_rect)
+    overlay.blit(game_over_text, game_over_rect)
+    overlay.blit(score_text, score_rect)
+    overlay.blit(restart_text, restart_rect)
+    overlay.blit(high_score_text, high_score_rect)
+    return overlay
 
 def draw_score(screen, score):
-    score_text = font.render('Score: %d' % score, True, WHITE)
+    score_text = render_text(get_font(TEXT_FONT), 'Score: %d' % score, WHITE)
     score_rect = score_text.get_rect(topleft=(10, 10))
     
     # Draw score background
@@ -264,14 +355,22 @@ def draw_score(screen, score):
     pygame.draw.rect(screen, GREEN, bg_rect, 2)
     
     screen.blit(score_text, score_rect)
+    return bg_rect
+
+def draw_autopilot(screen, text):
+    # Label in the bottom-left corner while the autopilot steers; returns
+    # the rect it covers
+    label = render_text(get_font(SMALL_FONT), text, WHITE)
+    rect = label.get_rect(bottomleft=(10, WINDOW_SIZE - 10))
+    bg_rect = rect.inflate(10, 10)
+    pygame.draw.rect(screen, DARK_GREEN, bg_rect)
+    pygame.draw.rect(screen, GREEN, bg_rect, 2)
+    screen.blit(label, rect)
+    return bg_rect
 
 def draw_victory(screen, score):
     # Draw background with gradient
-    for i in range(WINDOW_SIZE):
-        color = (int(255 * (i / WINDOW_SIZE)), 
-                255, 
-                int(100 * (1 - i / WINDOW_SIZE)))
-        pygame.draw.line(screen, color, (0, i), (WINDOW_SIZE, i))
+    screen.blit(victory_gradient(screen.get_size()), (0, 0))
     
     # Draw giant apple
     apple_size = WINDOW_SIZE // 2
@@ -300,22 +399,22 @@ def draw_victory(screen, score):
     pygame.draw.polygon(screen, GREEN, leaf_points)
     
     # Draw victory text
-    title_text = title_font.render('VICTORY!', True, GOLD)
+    title_text = render_text(get_font(TITLE_FONT), 'VICTORY!', GOLD)
     title_rect = title_text.get_rect(center=(WINDOW_SIZE//2, 50))
     screen.blit(title_text, title_rect)
     
-    score_text = font.render('Final Score: {score}', True, WHITE)
+    score_text = render_text(get_font(TEXT_FONT), 'Final Score: {score}', WHITE)
     score_rect = score_text.get_rect(center=(WINDOW_SIZE//2, WINDOW_SIZE - 100))
     screen.blit(score_text, score_rect)
     
-    restart_text = small_font.render('Press SPACE to play again', True, WHITE)
+    restart_text = render_text(get_font(SMALL_FONT), 'Press SPACE to play again', WHITE)
     restart_rect = restart_text.get_rect(center=(WINDOW_SIZE//2, WINDOW_SIZE - 50))
     screen.blit(restart_text, restart_rect)
 
-def draw_tree(screen, x, y):
+def draw_tree(screen, x, y, rng=random):
     # Draw tree trunk
-    trunk_width = random.randint(30, 40)
-    trunk_height = random.randint(100, 150)
+    trunk_width = rng.randint(30, 40)
+    trunk_height = rng.randint(100, 150)
     
     # Create a gradient effect for the trunk
     for i in range(trunk_width):
@@ -330,41 +429,78 @@ def draw_tree(screen, x, y):
                         (x + i, y - trunk_height))
     
     # Draw tree foliage (multiple circular clusters)
-    foliage_radius = random.randint(50, 70)
+    foliage_radius = rng.randint(50, 70)
     center_x = x + trunk_width // 2
     top_y = y - trunk_height
     
     # Draw multiple overlapping circles for fuller foliage
     for _ in range(5):
-        offset_x = random.randint(-20, 20)
-        offset_y = random.randint(-20, 20)
+        offset_x = rng.randint(-20, 20)
+        offset_y = rng.randint(-20, 20)
         pygame.draw.circle(screen, TREE_GREEN,
                          (center_x + offset_x, top_y + offset_y),
                          foliage_radius)
 
-def draw_background(screen):
-    # Fill with soil color
-    screen.fill(SOIL_BROWN)
-    
-    # Add more detailed soil texture with varying shades
-    for _ in range(2000):  # Increased number of details
-        x = random.randint(0, WINDOW_SIZE)
-        y = random.randint(0, WINDOW_SIZE)
-        size = random.randint(1, 4)  # Varying sizes for texture
-        color_offset = random.randint(-20, 20)
-        color = (
-            max(0, min(255, SOIL_BROWN[0] + color_offset)),
-            max(0, min(255, SOIL_BROWN[1] + color_offset)),
-            max(0, min(255, SOIL_BROWN[2] + color_offset))
-        )
-        pygame.draw.circle(screen, color, (x, y), 2)
+# Generated textures and pre-composed screens, keyed by name, size and
+# whatever else they depend on, so each is built once
+texture_cache = {}
+
+# Pixel offsets of a radius-2 dot
+DOT_OFFSETS = [(dx, dy) for dx in range(-2, 3) for dy in range(-2, 3)
+               if dx * dx + dy * dy <= 4]
+
+def soil_texture(size, dots, shade, seed=None):
+    # Soil brown with a sprinkle of slightly lighter and darker dots.
+    # All dots are stamped with NumPy in one go instead of one draw call each.
+    key = ('soil', size, dots, shade, seed)
+    if key not in texture_cache:
+        rng = np.random.default_rng(seed)
+        width, height = size
+        pixels = np.empty((width, height, 3), np.int16)
+        pixels[:] = SOIL_BROWN
+        xs = rng.integers(0, width + 1, dots)
+        ys = rng.integers(0, height + 1, dots)
+        colors = np.clip(np.array(SOIL_BROWN) + rng.integers(-shade, shade + 1, (dots, 1)),
+                         0, 255)
+        for dx, dy in DOT_OFFSETS:
+            px = xs + dx
+            py = ys + dy
+            inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+            pixels[px[inside], py[inside]] = colors[inside]
+        texture_cache[key] = pygame.surfarray.make_surface(pixels.astype(np.uint8))
+    return texture_cache[key]
+
+def victory_gradient(size):
+    # Red fades in and blue fades out from top to bottom
+    key = ('victory', size, None)
+    if key not in texture_cache:
+        width, height = size
+        progress = np.arange(height) / height
+        row_colors = np.stack([(255 * progress).astype(int),
+                               np.full(height, 255),
+                               (100 * (1 - progress)).astype(int)], axis=1)
+        pixels = np.broadcast_to(row_colors, (width, height, 3)).astype(np.uint8)
+        texture_cache[key] = pygame.surfarray.make_surface(pixels)
+    return texture_cache[key]
+
+def draw_background(screen, seed=None):
+    # Soil with a more detailed texture of varying shades
+    screen.blit(soil_texture(screen.get_size(), 2000, 20, seed), (0, 0))
 
 def draw_how_to_play(screen):
+    # Nothing on this screen ever changes, so it is composed once
+    key = ('how_to_play', screen.get_size())
+    if key not in texture_cache:
+        texture_cache[key] = build_how_to_play(screen.get_size())
+    screen.blit(texture_cache[key], (0, 0))
+
+def build_how_to_play(size):
     # Fill with black background
+    screen = pygame.Surface(size)
     screen.fill(BLACK)
     
     # Draw title
-    title = title_font.render("How to Play", True, GREEN)
+    title = render_text(get_font(TITLE_FONT), "How to Play", GREEN)
     title_rect = title.get_rect(center=(WINDOW_SIZE//2, 80))
     screen.blit(title, title_rect)
     
@@ -376,33 +512,25 @@ def draw_how_to_play(screen):
         "Don't collide with yourself",
         "Watch out for the enemy snake!",
         "Score 10 points to win",
+        "Press A to let the autopilot play",
         "",
         "Press ESC to return to title"
     ]
     
     # Draw instructions
     for i, text in enumerate(instructions):
-        instruction = game_font.render(text, True, WHITE)
+        instruction = render_text(get_font(TEXT_FONT), text, WHITE)
         rect = instruction.get_rect(center=(WINDOW_SIZE//2, 180 + i * 50))
         screen.blit(instruction, rect)
+    return screen
 
 def draw_title_screen(screen, after_game=False):
     # Fill background based on whether we're coming from a game
     if after_game:
         screen.fill(BLACK)
     else:
-        screen.fill(SOIL_BROWN)
         # Add soil texture only for initial title screen
-        for _ in range(1000):
-            x = random.randint(0, WINDOW_SIZE)
-            y = random.randint(0, WINDOW_SIZE)
-            color_offset = random.randint(-10, 10)
-            color = (
-                max(0, min(255, SOIL_BROWN[0] + color_offset)),
-                max(0, min(255, SOIL_BROWN[1] + color_offset)),
-                max(0, min(255, SOIL_BROWN[2] + color_offset))
-            )
-            pygame.draw.circle(screen, color, (x, y), 2)
+        screen.blit(soil_texture(screen.get_size(), 1000, 10), (0, 0))
     
     # Create animated snake title
     current_time = pygame.time.get_ticks()
@@ -411,23 +539,25 @@ def draw_title_screen(screen, after_game=False):
     # Draw "SNAKE" text with wave effect
     title_text = "SNAKE"
     for i, letter in enumerate(title_text):
-        letter_surf = title_font.render(letter, True, GREEN)
+        letter_surf = render_text(get_font(TITLE_FONT), letter, GREEN)
         letter_rect = letter_surf.get_rect()
         x = WINDOW_SIZE//2 - (len(title_text) * 50)//2 + i * 50
         y = WINDOW_SIZE//3 + math.sin(current_time/500 + i/2) * 10
         screen.blit(letter_surf, (x, y))
     
-    # Draw subtitle with pulsing effect
+    # Draw subtitle with pulsing effect, snapped to a few levels so the
+    # rendered text can be reused
     pulse = (math.sin(current_time / 400) + 1) / 2
+    pulse = round(pulse * (PULSE_LEVELS - 1)) / (PULSE_LEVELS - 1)
     subtitle_color = (int(255 * pulse), 255, int(255 * pulse))
     
     # Draw "Press SPACE to Start" text
-    start_text = subtitle_font.render("Press SPACE to Start", True, subtitle_color)
+    start_text = render_text(get_font(TEXT_FONT), "Press SPACE to Start", subtitle_color)
     start_rect = start_text.get_rect(center=(WINDOW_SIZE//2, WINDOW_SIZE * 2//3))
     screen.blit(start_text, start_rect)
     
     # Draw "How to Play (H)" text
-    how_to_play_text = subtitle_font.render("How to Play (H)", True, WHITE)
+    how_to_play_text = render_text(get_font(TEXT_FONT), "How to Play (H)", WHITE)
     how_to_play_rect = how_to_play_text.get_rect(center=(WINDOW_SIZE//2, WINDOW_SIZE * 2//3 + 50))
     screen.blit(how_to_play_text, how_to_play_rect)
     
@@ -447,121 +577,572 @@ def draw_title_screen(screen, after_game=False):
     pygame.draw.circle(screen, WHITE, (head_x - 8, head_y - 8), 4)
     pygame.draw.circle(screen, WHITE, (head_x - 8, head_y + 8), 4)
 
-def main():
-    snake = Snake()
-    enemy_snake = EnemySnake()
-    food_pos = (random.randint(0, GRID_COUNT-1), random.randint(0, GRID_COUNT-1))
-    score = 0
-    game_over = False
-    victory = False
+def cells_in_rect(rect, view=DEFAULT_VIEW):
+    # Grid cells touched by a pixel rectangle
+    cell = view.cell
+    last = view.board_size - 1
+    left = max((rect.left + view.left) // cell, 0)
+    right = min((rect.right - 1 + view.left) // cell, last)
+    top = max((rect.top + view.top) // cell, 0)
+    bottom = min((rect.bottom - 1 + view.top) // cell, last)
+    return [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)]
+
+def enemy_cells(game):
+    return [pos for enemy in game.enemies for pos in enemy.body]
+
+class GameRenderer:
+    # Draws the gameplay screen. With dirty=True only the cells that changed
+    # since the last frame are redrawn, and draw() returns just those rects
+    # for pygame.display.update(); otherwise the whole window is redrawn.
+    # Every tick must be seen by observe() or draw(), which observes it too,
+    # so a frame that runs several ticks observes all but the last and draws
+    # once. draw() may also be called any number of times between ticks.
+    # With interpolate=True the head then slides between cells according to
+    # alpha, the fraction of the next tick elapsed.
+    #
+    # view sets the board and cell size. A board too big for the window is
+    # drawn through a camera that follows the head, and with lod=True cells
+    # are flat colours; either way only the cells in view are looked at and
+    # the whole window is redrawn every frame, so a frame costs the same on
+    # any size of board.
+    def __init__(self, background, dirty=True, interpolate=False, profiler=None,
+                 view=None, lod=False):
+        self.background = background
+        self.dirty = dirty
+        self.interpolate = interpolate
+        self.view = view or DEFAULT_VIEW
+        self.lod = lod
+        self.lod_surface = None
+        self.lod_scaled = None
+        self.mark = profiler.mark if profiler is not None else lambda phase: None
+        self.invalidate()
+
+    def invalidate(self):
+        # Forget the last frame; the next draw() repaints everything
+        self.game = None
+        self.ticks = None
+        self.drawn = False
+        self.phase = 0
+        self.moved_from = None
+        self.last_head = None
+        self.last_tail = None
+        self.last_food = None
+        self.last_enemy = []
+        self.last_score = None
+        self.score_rect = None
+        # Heads and other cells drawn in an earlier frame that ticks since
+        # have moved away from, for draw_changes()
+        self.stale_heads = []
+        self.stale = []
+        # Scale pattern of the body segment in each cell
+        self.parity = bytearray(self.view.board_size ** 2)
+
+    def observe(self, game):
+        # Follows the game to its current tick without drawing anything
+        if game is self.game and game.ticks == self.ticks:
+            return
+        snake = game.snake
+        head = snake.body[0]
+        size = self.view.board_size
+        if game is not self.game:
+            self.invalidate()
+            self.game = game
+            self.paint_parity(game)
+        elif head != self.last_head:
+            self.phase += 1
+            self.parity[head[1] * size + head[0]] = self.phase & 1
+            self.moved_from = self.last_head
+        if self.drawn and self.dirty:
+            self.stale_heads.append(self.last_head)
+            self.stale.append(self.last_tail)
+            self.stale += self.last_enemy
+            if self.last_food is not None:
+                self.stale.append(self.last_food)
+        self.ticks = game.ticks
+        self.last_head = head
+        self.last_tail = snake.body[-1]
+        self.last_food = game.food_pos
+        self.last_enemy = enemy_cells(game)
+
+    def draw(self, screen, game, alpha=1.0):
+        self.observe(game)
+        head = game.snake.body[0]
+        head_shift = (0, 0)
+        if self.interpolate and self.moved_from is not None and not game.done:
+            lag = (1 - alpha) * self.view.cell
+            head_shift = (int((self.moved_from[0] - head[0]) * lag),
+                          int((self.moved_from[1] - head[1]) * lag))
+
+        if self.lod or self.view.scrolls:
+            rects = self.draw_view(screen, game, head_shift)
+        elif self.dirty and self.drawn:
+            rects = self.draw_changes(screen, game, head_shift)
+        else:
+            rects = self.draw_everything(screen, game, head_shift)
+
+        self.drawn = True
+        self.stale_heads = []
+        self.stale = []
+        self.last_score = game.score
+        return rects
+
+    def paint_parity(self, game):
+        size = self.view.board_size
+        for i, (x, y) in enumerate(game.snake.body):
+            self.parity[y * size + x] = (self.phase - i) & 1
+
+    def draw_everything(self, screen, game, head_shift):
+        view = self.view
+        screen.blit(self.background, (0, 0))
+        self.mark('background')
+        draw_snake(screen, game.snake, self.phase, head_shift, view)
+        self.paint_parity(game)
+        for enemy in game.enemies:
+            for segment in enemy.body:
+                draw_enemy_snake(screen, segment, view)
+        if game.food_pos is not None:
+            draw_food_block(screen, game.food_pos, view)
+        self.mark('snakes')
+        self.score_rect = draw_score(screen, game.score)
+        self.mark('hud')
+        return [screen.get_rect()]
+
+    def draw_changes(self, screen, game, head_shift):
+        view = self.view
+        snake = game.snake
+        head = snake.body[0]
+        screen_rect = screen.get_rect()
+
+        # The old and new heads get a full cell of margin for the eyes and
+        # tongue, or two when the head slides between cells; everything
+        # else that changed is a single cell
+        margin = view.cell * 2 if self.interpolate else view.cell
+        rects = [view.cell_rect(pos, margin) for pos in self.stale_heads + [head]]
+        for pos in self.stale + self.last_enemy:
+            rects.append(view.cell_rect(pos))
+        if game.food_pos is not None:
+            rects.append(view.cell_rect(game.food_pos))
+        if game.score != self.last_score:
+            rects.append(self.score_rect)
+        rects = [rect.clip(screen_rect) for rect in rects]
+
+        # Put the background back under everything that changed
+        cells = set()
+        for rect in rects:
+            screen.blit(self.background, rect, rect)
+            cells.update(cells_in_rect(rect, view))
+        self.mark('background')
+
+        # Redraw whatever sits in those cells, in the same order as a full frame
+        occupancy = game.occupancy
+        sprites = get_snake_sprites(view.cell)
+        tiles = (sprites['even'], sprites['odd'])
+        size = view.board_size
+        blits = [head_blit(snake, head_shift, view)]
+        for x, y in cells:
+            if (x, y) != head and occupancy.occupied((x, y), PLAYER):
+                pixel = view.pixel((x, y))
+                blits.append((tiles[self.parity[y * size + x]],
+                              (pixel[0] + 1, pixel[1] + 1)))
+        if head_shift != (0, 0):
+            blits.append(blits.pop(0))
+        screen.blits(blits, False)
+        draw_tongue(screen, head, snake.direction, head_shift, view)
+        for pos in cells:
+            if occupancy.occupied(pos, ENEMY):
+                draw_enemy_snake(screen, pos, view)
+        if game.food_pos in cells:
+            draw_food_block(screen, game.food_pos, view)
+        self.mark('snakes')
+
+        # The score box goes on top if it changed or anything under it did
+        if (game.score != self.last_score or
+                self.score_rect.collidelist(rects) != -1):
+            self.score_rect = draw_score(screen, game.score)
+            rects.append(self.score_rect)
+        self.mark('hud')
+        return rects
+
+    def draw_view(self, screen, game, head_shift):
+        # Camera and low-detail frames. The cells in view are picked out of
+        # the occupancy bytes with NumPy, so cells off screen cost nothing.
+        view = self.view
+        snake = game.snake
+        head = snake.body[0]
+        view.follow(head)
+        x0, y0, x1, y1 = view.visible()
+        size = view.board_size
+        board = np.frombuffer(game.occupancy.cells, np.uint8).reshape(size, size)[y0:y1, x0:x1]
+        food = game.food_pos
+        if food is not None and not (x0 <= food[0] < x1 and y0 <= food[1] < y1):
+            food = None
+
+        if self.lod:
+            self.draw_flat(screen, game, board, food)
+        else:
+            screen.blit(self.background, (0, 0))
+            self.mark('background')
+            sprites = get_snake_sprites(view.cell)
+            tiles = (sprites['even'], sprites['odd'])
+            parity = self.parity
+            blits = [head_blit(snake, head_shift, view)]
+            ys, xs = np.nonzero(board & PLAYER)
+            for x, y in zip((xs + x0).tolist(), (ys + y0).tolist()):
+                if (x, y) != head:
+                    pixel = view.pixel((x, y))
+                    blits.append((tiles[parity[y * size + x]], (pixel[0] + 1, pixel[1] + 1)))
+            if head_shift != (0, 0):
+                blits.append(blits.pop(0))
+            screen.blits(blits, False)
+            draw_tongue(screen, head, snake.direction, head_shift, view)
+            ys, xs = np.nonzero(board & ENEMY)
+            for pos in zip((xs + x0).tolist(), (ys + y0).tolist()):
+                draw_enemy_snake(screen, pos, view)
+            if food is not None:
+                draw_food_block(screen, food, view)
+        self.mark('snakes')
+        self.score_rect = draw_score(screen, game.score)
+        self.mark('hud')
+        return [screen.get_rect()]
+
+    def draw_flat(self, screen, game, board, food):
+        # One pixel per cell in view, coloured by what is in it, then scaled
+        # up to the cell size. The camera moves in whole cells, so the first
+        # cell in view is always at the window's top-left corner.
+        view = self.view
+        x0, y0 = view.left // view.cell, view.top // view.cell
+        colors = LOD_PALETTE[board]
+        head = game.snake.body[0]
+        colors[head[1] - y0, head[0] - x0] = LOD_HEAD
+        if food is not None:
+            colors[food[1] - y0, food[0] - x0] = GOLD
+        rows, columns = board.shape
+        scaled_size = (columns * view.cell, rows * view.cell)
+        if self.lod_surface is None or self.lod_surface.get_size() != (columns, rows):
+            self.lod_surface = pygame.Surface((columns, rows), 0, screen)
+            self.lod_scaled = None
+        # surfarray indexes columns first
+        pygame.surfarray.blit_array(self.lod_surface, colors.transpose(1, 0, 2))
+        width, height = screen.get_size()
+        if scaled_size[0] <= width and scaled_size[1] <= height:
+            if scaled_size != (width, height):
+                screen.fill(BLACK)
+            # Straight onto the window, without an intermediate surface
+            pygame.transform.scale(self.lod_surface, scaled_size,
+                                   screen.subsurface((0, 0), scaled_size))
+        else:
+            # The last row or column of cells is only partly in view
+            if self.lod_scaled is None:
+                self.lod_scaled = pygame.Surface(scaled_size, 0, screen)
+            pygame.transform.scale(self.lod_surface, scaled_size, self.lod_scaled)
+            screen.blit(self.lod_scaled, (0, 0))
+
+def draw_profiler(screen, profiler):
+    # Timings overlay in the top-right corner; returns the rect it covers.
+    # The numbers only change every PROFILER_REFRESH frames.
+    cached = texture_cache.get('profiler')
+    if cached is None or profiler.frames - cached[0] >= PROFILER_REFRESH:
+        cached = (profiler.frames, build_profiler(profiler))
+        texture_cache['profiler'] = cached
+    panel = cached[1]
+    rect = panel.get_rect(topright=(WINDOW_SIZE - 10, 10))
+    screen.blit(panel, rect)
+    return rect
+
+def build_profiler(profiler):
+    fps, ticks = profiler.rates()
+    stats = profiler.stats()
+    rows = [('ms', 'p50', 'p95', 'p99')]
+    for phase in PHASES + ('frame',):
+        rows.append((phase,) + tuple('%.2f' % (t * 1000) for t in stats[phase]))
+    lines = ['fps %.1f / %d   ticks/s %.1f / %d' % (fps, FRAME_RATE, ticks, GAME_SPEED),
+             'first frame after %.0f ms' % (1000 * (startup_time or 0))]
+    if profiler.track_allocations:
+        blocks = profiler.allocated_blocks
+        lines.append('blocks kept %d   peak %d KB' % (
+            sum(blocks) // max(len(blocks), 1),
+            max(profiler.peak_bytes, default=0) // 1024))
+
+    # Not through render_text: these change all the time and would push
+    # everything else out of its cache
+    font = get_font(SMALL_FONT)
+    cells = [[font.render(text, True, WHITE) for text in row] for row in rows]
+    texts = [font.render(line, True, WHITE) for line in lines]
+    line_height = font.get_linesize()
+    label_width = max(row[0].get_width() for row in cells) + 10
+    column_width = max(cell.get_width() for row in cells for cell in row[1:]) + 10
+    width = max([label_width + 3 * column_width] +
+                [text.get_width() for text in texts]) + 12
+    height = (len(rows) + len(texts)) * line_height + 12
+    # The panel only ever grows: in dirty-rect frames nothing would redraw
+    # the strip a smaller panel leaves uncovered
+    grown = texture_cache.get('profiler_size', (0, 0))
+    width = max(width, grown[0])
+    height = max(height, grown[1])
+    texture_cache['profiler_size'] = (width, height)
+    panel = pygame.Surface((width, height))
+    panel.fill(BLACK)
+    pygame.draw.rect(panel, GRAY, panel.get_rect(), 1)
+    y = 6
+    panel.blit(texts[0], (6, y))
+    y += line_height
+    for row in cells:
+        panel.blit(row[0], (6, y))
+        for i, cell in enumerate(row[1:]):
+            # Numbers are right-aligned in their columns
+            right = 6 + label_width + (i + 1) * column_width
+            panel.blit(cell, (right - cell.get_width(), y))
+        y += line_height
+    for text in texts[1:]:
+        panel.blit(text, (6, y))
+        y += line_height
+    return panel
+
+KEY_DIRECTIONS = {
+    pygame.K_UP: UP,
+    pygame.K_DOWN: DOWN,
+    pygame.K_LEFT: LEFT,
+    pygame.K_RIGHT: RIGHT,
+}
+
+def save_replay(recorder):
+    os.makedirs(REPLAY_DIR, exist_ok=True)
+    name = '%s-%016x.snkr' % (time.strftime('%Y%m%d-%H%M%S'), recorder.seed)
+    recorder.replay().save(os.path.join(REPLAY_DIR, name))
+
+startup_time = None  # Seconds from import to the first frame on screen
+
+def warm_up(renderer):
+    # Builds everything past the title screen, one piece per step, so the
+    # title can be shown straight away. main() takes a step on each title
+    # frame and runs whatever is left when a game starts.
+    size = (WINDOW_SIZE, WINDOW_SIZE)
+    soil_texture(size, 1000, 10)  # The title screen's own texture
+    yield
+    background = pygame.Surface(size)
+    draw_background(background)
+    renderer.background = background
+    yield
+    if not renderer.lod:
+        # Flat-colour frames draw no sprites
+        get_snake_sprites(renderer.view.cell)
+    yield
+    draw_how_to_play(pygame.Surface(size))
+    yield
+    build_game_over(size, 0)
+    victory_gradient(size)
+
+def main(frames=None, board_size=GRID_COUNT, cell_size=None, lod=None):
+    # frames stops the game after that many frames, for timing startup.
+    # Returns the seconds from importing this module to the first frame.
+    #
+    # cell_size defaults to whatever fits the board in the window, down to
+    # MIN_CELL_SIZE, past which the board scrolls; it is never smaller than
+    # that. lod defaults to on for cells smaller than LOD_CELL_SIZE.
+    global startup_time
+    if cell_size is None:
+        cell_size = WINDOW_SIZE // board_size
+    cell_size = max(cell_size, MIN_CELL_SIZE)
+    if lod is None:
+        lod = cell_size < LOD_CELL_SIZE
+    screen = init_display()
+    clock = pygame.time.Clock()
+    game = GameState(make_enemy_brains(ENEMY_AI, ENEMY_COUNT, board_size), board_size)
+    recorder = ReplayRecorder(game, ENEMY_AI)
     in_title_screen = True
     in_how_to_play = False
     after_game = False
+    # The autopilot plays demo games on its own after ATTRACT_DELAY seconds
+    # on the title screen, and steers a real game while AUTOPILOT_KEY is on
+    autopilot = Autopilot()
+    autopilot_on = False
+    demo = False
+    title_since = time.perf_counter()
     
-    # Create static background surface
-    background = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
-    draw_background(background)
+    profiler = FrameProfiler(csv_path=PROFILE_CSV)
+    show_profiler = False
+    # The background is filled in by warm_up()
+    view = BoardView(board_size, cell_size)
+    renderer = GameRenderer(None, DIRTY_RECT_RENDERING, INTERPOLATE, profiler, view, lod)
+    warming = warm_up(renderer)
+    title_ready = False
+    frame = 0
+    
+    # The game advances in fixed ticks of tick_time seconds, however long
+    # frames take; accumulator holds the time not yet simulated
+    tick_time = 1 / GAME_SPEED
+    accumulator = 0.0
+    last_time = time.perf_counter()
 
     while True:
+        # Timings are only taken while someone is looking at them
+        profiler.enabled = show_profiler or PROFILE_CSV is not None
+        profiler.start_frame()
+        now = time.perf_counter()
+        accumulator += now - last_time
+        last_time = now
+        
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
+                profiler.close()
+                quit_pygame()
                 sys.exit()
             if event.type == pygame.KEYDOWN:
-                if in_how_to_play:
+                if event.key == PROFILER_KEY:
+                    show_profiler = not show_profiler
+                    if not show_profiler:
+                        # Allocations are only counted while they are shown
+                        profiler.set_tracking(False)
+                    renderer.invalidate()
+                elif event.key == ALLOCATIONS_KEY:
+                    profiler.set_tracking(not profiler.track_allocations)
+                    if profiler.track_allocations and not show_profiler:
+                        show_profiler = True
+                        renderer.invalidate()
+                elif event.key == DUMP_KEY:
+                    profiler.dump(PROFILE_DUMP)
+                elif demo:
+                    # Any key ends the demo
+                    demo = False
+                    in_title_screen = True
+                    title_since = now
+                elif in_how_to_play:
                     if event.key == pygame.K_ESCAPE:
                         in_how_to_play = False
                         in_title_screen = True
+                        title_since = now
                 elif in_title_screen:
                     if event.key == pygame.K_SPACE:
+                        for _ in warming:
+                            pass
                         in_title_screen = False
                         after_game = False
-                        snake.reset()
-                        enemy_snake.reset()
-                        food_pos = (random.randint(0, GRID_COUNT-1), 
-                                  random.randint(0, GRID_COUNT-1))
-                        score = 0
-                        game_over = False
-                        victory = False
+                        game.reset()
+                        recorder.start()
+                        accumulator = 0.0
                     elif event.key == pygame.K_h:
                         in_title_screen = False
                         in_how_to_play = True
-                elif game_over or victory:
+                    title_since = now
+                elif game.done:
                     if event.key == pygame.K_SPACE:
                         in_title_screen = True
                         after_game = True
-                        game_over = False
-                        victory = False
-                else:
-                    if event.key == pygame.K_UP and snake.direction != [0, 1]:
-                        snake.change_direction([0, -1])
-                    elif event.key == pygame.K_DOWN and snake.direction != [0, -1]:
-                        snake.change_direction([0, 1])
-                    elif event.key == pygame.K_LEFT and snake.direction != [1, 0]:
-                        snake.change_direction([-1, 0])
-                    elif event.key == pygame.K_RIGHT and snake.direction != [-1, 0]:
-                        snake.change_direction([1, 0])
+                        game.game_over = False
+                        game.victory = False
+                        title_since = now
+                elif event.key == AUTOPILOT_KEY:
+                    autopilot_on = not autopilot_on
+                    renderer.invalidate()
+                elif event.key in KEY_DIRECTIONS:
+                    game.queue_direction(KEY_DIRECTIONS[event.key])
+        if (in_title_screen and ATTRACT_DELAY is not None and
+                now - title_since >= ATTRACT_DELAY):
+            for _ in warming:
+                pass
+            in_title_screen = False
+            demo = True
+            game.reset()
+            recorder.start()
+            accumulator = 0.0
+        profiler.mark('events')
         
-        # Clear the screen at the start of each frame
-        screen.fill(BLACK)
+        # Only the gameplay screen can update part of the window
+        dirty_rects = None
         
         if in_how_to_play:
             draw_how_to_play(screen)
+            profiler.mark('hud')
         elif in_title_screen:
+            # Plain black until warm_up() has made the soil texture
+            draw_title_screen(screen, after_game or not title_ready)
+            profiler.mark('hud')
+        elif not game.done:
+            # Run every tick that is due. The renderer has to see each tick,
+            # so any tick but the last is observed before the next one runs.
+            dirty_rects = []
+            ticks = 0
+            while accumulator >= tick_time and not game.done:
+                if ticks:
+                    renderer.observe(game)
+                action = autopilot(game) if demo or autopilot_on else None
+                if not recorder.step(action) and REPLAY_DIR and not demo:
+                    save_replay(recorder)
+                profiler.tick()
+                profiler.mark('simulation')
+                accumulator -= tick_time
+                ticks += 1
+                if ticks == MAX_TICKS_PER_FRAME:
+                    accumulator = 0.0
+            dirty_rects += renderer.draw(screen, game, accumulator / tick_time)
+            if demo or autopilot_on:
+                dirty_rects.append(draw_autopilot(
+                    screen, 'DEMO - press any key' if demo else 'AUTOPILOT (A)'))
+                profiler.mark('hud')
+        elif demo:
+            # A finished demo goes straight back to the title screen
+            demo = False
+            in_title_screen = True
+            game.game_over = False
+            game.victory = False
+            title_since = now
             draw_title_screen(screen, after_game)
-        elif not game_over and not victory:
-            # Draw the game screen
-            screen.blit(background, (0, 0))
-            
-            # Move snake and check for collisions
-            if not snake.move():
-                game_over = True
-            
-            # Move enemy snake
-            if not enemy_snake.move(snake.body[0]):
-                game_over = True
-            
-            # Check if enemy caught the player
-            if snake.body[0] in enemy_snake.body:
-                game_over = True
-            
-            # Check for food collision
-            if snake.body[0] == food_pos:
-                snake.grow = True
-                score += 1
-                
-                # Check for victory
-                if score >= 10:
-                    victory = True
-                else:
-                    food_pos = (random.randint(0, GRID_COUNT-1), 
-                              random.randint(0, GRID_COUNT-1))
-                    while (food_pos in snake.body or 
-                          food_pos in enemy_snake.body):
-                        food_pos = (random.randint(0, GRID_COUNT-1), 
-                                  random.randint(0, GRID_COUNT-1))
-            
-            # Draw everything
-            for i, segment in enumerate(snake.body):
-                draw_snake_segment(screen, segment, snake, i == 0, i)
-            
-            for segment in enemy_snake.body:
-                draw_enemy_snake(screen, segment)
-            
-            # Draw food
-            pygame.draw.rect(screen, GOLD, 
-                           (food_pos[0] * GRID_SIZE, food_pos[1] * GRID_SIZE,
-                            GRID_SIZE - 2, GRID_SIZE - 2))
-            
-            draw_score(screen, score)
+            profiler.mark('hud')
+        else:
+            # Clear the screen behind the game over / victory overlays
+            screen.fill(BLACK)
+            profiler.mark('background')
+        
+        if game.game_over:
+            draw_game_over(screen, game.score)
+            dirty_rects = None
+            profiler.mark('hud')
+        elif game.victory:
+            draw_victory(screen, game.score)
+            dirty_rects = None
+            profiler.mark('hud')
         
-        if game_over:
-            draw_game_over(screen, score)
-        elif victory:
-            draw_victory(screen, score)
+        if show_profiler:
+            rect = draw_profiler(screen, profiler)
+            if dirty_rects is not None:
+                dirty_rects.append(rect)
+            profiler.mark('overlay')
         
-        pygame.display.flip()
-        clock.tick(GAME_SPEED)
+        if dirty_rects is None:
+            renderer.invalidate()
+            accumulator = 0.0
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty_rects)
+        profiler.mark('flip')
+        if startup_time is None:
+            startup_time = time.perf_counter() - STARTED
+        if in_title_screen:
+            # Build one more asset while the frame is on screen
+            next(warming, None)
+            title_ready = True
+            profiler.mark('hud')
+        frame += 1
+        if frames is not None and frame >= frames:
+            profiler.close()
+            quit_pygame()
+            return startup_time
+        clock.tick(FRAME_RATE)
+        profiler.mark('wait')
+        profiler.end_frame()
+
+def cell_size_arg(text):
+    cell = int(text)
+    if cell < MIN_CELL_SIZE:
+        raise argparse.ArgumentTypeError('cells must be at least %d pixels' % MIN_CELL_SIZE)
+    return cell
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Play snake')
+    parser.add_argument('--board', type=int, default=GRID_COUNT, help='cells along each side')
+    parser.add_argument('--cell', type=cell_size_arg, default=None,
+                        help='pixels per cell; a board that does not fit scrolls')
+    parser.add_argument('--lod', action=argparse.BooleanOptionalAction, default=None,
+                        help='draw cells as flat colours (default: when cells are small)')
+    args = parser.parse_args()
+    main(board_size=args.board, cell_size=args.cell, lod=args.lod)
@@ -0,0 +1,135 @@
+import csv
+import time
+import tracemalloc
+from collections import deque
+
+# Where each frame of main() spends its time. Phases are marked in the
+# order they happen; each mark() charges the time since the previous mark
+# to its phase, so a phase can be marked several times in one frame.
+PHASES = ('events', 'simulation', 'background', 'snakes', 'hud', 'overlay', 'flip', 'wait')
+FRAME_HISTORY = 300  # Frames kept for the percentiles and dump()
+ALLOCATION_SAMPLE_EVERY = 30  # Frames between allocation snapshots
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+class FrameProfiler:
+    # Per-phase frame timings over the last FRAME_HISTORY frames.
+    #
+    # Nothing is measured unless enabled is set: every method returns
+    # straight away, so leaving the calls in main() costs next to nothing.
+    #
+    # With set_tracking(True), tracemalloc runs too. Every frame records its
+    # peak traced memory, and every ALLOCATION_SAMPLE_EVERY frames the
+    # number of blocks the frame allocated and kept is counted from two
+    # snapshots. tracemalloc slows everything down, so timings taken
+    # meanwhile are only good for comparing with each other.
+    def __init__(self, history=FRAME_HISTORY, csv_path=None):
+        self.enabled = False
+        self.track_allocations = False
+        self.frames = 0
+        self.times = {phase: deque(maxlen=history) for phase in PHASES}
+        self.frame_times = deque(maxlen=history)
+        self.frame_ticks = deque(maxlen=history)
+        self.peak_bytes = deque(maxlen=history)
+        self.allocated_blocks = deque(maxlen=history // ALLOCATION_SAMPLE_EVERY + 1)
+        self.before = None
+        self.csv_file = None
+        self.csv = None
+        if csv_path:
+            # Stream every measured frame, for runs longer than the history
+            self.csv_file = open(csv_path, 'w', newline='')
+            self.csv = csv.writer(self.csv_file)
+            self.csv.writerow(self.header())
+
+    def header(self):
+        return ('frame', 'total_ms', 'ticks', 'peak_kb') + tuple(p + '_ms' for p in PHASES)
+
+    def set_tracking(self, track):
+        self.track_allocations = track
+        if track and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not track and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.before = None
+
+    def start_frame(self):
+        if not self.enabled:
+            return
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.ticks = 0
+        if self.track_allocations:
+            tracemalloc.reset_peak()
+            if self.frames % ALLOCATION_SAMPLE_EVERY == 0:
+                self.before = tracemalloc.take_snapshot()
+        self.start = self.last = time.perf_counter()
+
+    def mark(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def tick(self):
+        if self.enabled:
+            self.ticks += 1
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        total = time.perf_counter() - self.start
+        self.frames += 1
+        self.frame_times.append(total)
+        self.frame_ticks.append(self.ticks)
+        for phase in PHASES:
+            self.times[phase].append(self.current[phase])
+        peak = 0
+        if self.track_allocations:
+            peak = tracemalloc.get_traced_memory()[1]
+            if self.before is not None:
+                after = tracemalloc.take_snapshot()
+                self.allocated_blocks.append(sum(
+                    max(stat.count_diff, 0)
+                    for stat in after.compare_to(self.before, 'lineno')))
+                self.before = None
+        self.peak_bytes.append(peak)
+        if self.csv is not None:
+            self.csv.writerow(self.row(self.frames, total, self.ticks, peak, self.current))
+
+    def row(self, frame, total, ticks, peak, times):
+        return ((frame, '%.3f' % (total * 1000), ticks, '%.1f' % (peak / 1024)) +
+                tuple('%.3f' % (times[phase] * 1000) for phase in PHASES))
+
+    def stats(self):
+        # {phase: (p50, p95, p99)} in seconds, with 'frame' for whole frames
+        stats = {}
+        for phase, times in list(self.times.items()) + [('frame', self.frame_times)]:
+            ordered = sorted(times)
+            stats[phase] = tuple(percentile(ordered, f) for f in (0.5, 0.95, 0.99))
+        return stats
+
+    def rates(self):
+        # Frames and game ticks per second over the history
+        elapsed = sum(self.frame_times)
+        if not elapsed:
+            return 0.0, 0.0
+        return len(self.frame_times) / elapsed, sum(self.frame_ticks) / elapsed
+
+    def dump(self, path):
+        # Writes the frames in the history to a CSV file
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.header())
+            first = self.frames - len(self.frame_times) + 1
+            for i, total in enumerate(self.frame_times):
+                times = {phase: self.times[phase][i] for phase in PHASES}
+                writer.writerow(self.row(first + i, total, self.frame_ticks[i],
+                                         self.peak_bytes[i], times))
+
+    def close(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+        self.set_tracking(False)
@@ -0,0 +1,222 @@
+import argparse
+import glob
+import struct
+import sys
+import time
+
+from snake_engine import GRID_COUNT, DIRECTIONS, DEATHS, GameState
+from snake_ai import ENEMY_BRAINS, make_enemy_brains
+
+# A replay is everything needed to play a game again exactly: its seed, its
+# settings and the ticks on which the player's snake turned. The snake only
+# turns a handful of times per food, so a whole game is a few dozen bytes.
+#
+# File layout, little-endian:
+#
+#     HEADER                   magic, version, board size, enemy brain,
+#                              enemy count, seed, final score, final tick,
+#                              how the game ended
+#     one varint per turn      (ticks since the previous turn << 2) | direction
+#
+# where direction is an index into DIRECTIONS.
+
+MAGIC = b'SNKR'
+VERSION = 3  # 1 drew every food from one generator seeded at the start,
+             # 2 picked food by the order of the free-cell list
+HEADER = struct.Struct('<4sBHBHQHIB')
+
+class ReplayError(ValueError):
+    pass
+
+class Replay:
+    def __init__(self, seed, size=GRID_COUNT, enemy='greedy', enemies=1,
+                 score=0, ticks=0, death=None, turns=b''):
+        self.seed = seed
+        self.size = size
+        self.enemy = enemy
+        self.enemies = enemies
+        self.score = score
+        self.ticks = ticks
+        self.death = death
+        self.turns = turns  # Encoded varints, see iter_turns()
+
+    def to_bytes(self):
+        return HEADER.pack(MAGIC, VERSION, self.size, ENEMY_BRAINS.index(self.enemy),
+                           self.enemies, self.seed, self.score, self.ticks,
+                           DEATHS.index(self.death)) + bytes(self.turns)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ReplayError('replay is truncated')
+        (magic, version, size, enemy, enemies, seed, score, ticks,
+         death) = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ReplayError('not a replay file')
+        if version != VERSION:
+            raise ReplayError('unsupported replay version %d' % version)
+        if enemy >= len(ENEMY_BRAINS) or death >= len(DEATHS):
+            raise ReplayError('corrupt replay header')
+        return cls(seed, size, ENEMY_BRAINS[enemy], enemies, score, ticks,
+                   DEATHS[death], bytes(data[HEADER.size:]))
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    def iter_turns(self):
+        # (tick, direction) of every turn, in the order they happened
+        tick = 0
+        value = 0
+        shift = 0
+        for byte in self.turns:
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+                continue
+            tick += value >> 2
+            yield tick, DIRECTIONS[value & 3]
+            value = 0
+            shift = 0
+        if shift:
+            raise ReplayError('replay ends in the middle of a turn')
+
+class ReplayRecorder:
+    # Steps a GameState and notes every tick on which the player turned.
+    # Call start() after each game.reset().
+    #
+    # With snapshot_every set, a GameState.snapshot() is also kept every that
+    # many ticks in snapshots, as (tick, data), so playback can start part
+    # way through the game (see snake_archive).
+    def __init__(self, game, enemy='greedy', snapshot_every=None):
+        self.game = game
+        self.enemy = enemy
+        self.snapshot_every = snapshot_every
+        self.start()
+
+    def start(self):
+        self.seed = self.game.seed
+        self.turns = bytearray()
+        self.last_turn = 0
+        self.snapshots = []
+
+    def step(self, action=None):
+        game = self.game
+        tick = game.ticks
+        code = game.snake.code
+        alive = game.step(action)
+        if game.snake.code != code and game.ticks > tick:
+            value = ((tick - self.last_turn) << 2) | game.snake.code
+            self.last_turn = tick
+            while value > 0x7F:
+                self.turns.append(value & 0x7F | 0x80)
+                value >>= 7
+            self.turns.append(value)
+        if (self.snapshot_every and alive and game.ticks > tick and
+                game.ticks % self.snapshot_every == 0):
+            self.snapshots.append((game.ticks, game.snapshot()))
+        return alive
+
+    def replay(self):
+        game = self.game
+        return Replay(self.seed, game.size, self.enemy, len(game.enemies),
+                      min(game.score, 0xFFFF), game.ticks, game.death, bytes(self.turns))
+
+def play_replay(replay, game=None, until=None, snapshot=None):
+    # Plays the replay headless, up to tick `until` or to the end, and
+    # returns the GameState. Pass a game made with the replay's settings to
+    # save building a new one, and a snapshot taken during the replay to
+    # start from there instead of from tick 0.
+    if game is None:
+        game = GameState(make_enemy_brains(replay.enemy, replay.enemies, replay.size),
+                         replay.size)
+    if snapshot is not None:
+        game.restore(snapshot)
+    else:
+        game.reset(replay.seed)
+    end = replay.ticks if until is None else min(until, replay.ticks)
+    step = game.step
+    for tick, direction in replay.iter_turns():
+        if tick < game.ticks:
+            continue
+        if tick >= end:
+            break
+        while game.ticks < tick:
+            if not step():
+                return game
+        if not step(direction):
+            return game
+    while game.ticks < end and step():
+        pass
+    return game
+
+def check_replay(replay, game=None):
+    # Returns None if the replay plays out as recorded, otherwise what differed
+    game = play_replay(replay, game)
+    expected = (replay.score, replay.ticks, replay.death)
+    actual = (min(game.score, 0xFFFF), game.ticks, game.death)
+    if actual != expected:
+        return 'expected score %d, tick %d, death %s; got score %d, tick %d, death %s' % (
+            expected + actual)
+    return None
+
+class ReplayChecker:
+    # Checks many replays, keeping one GameState per set of game settings
+    def __init__(self):
+        self.games = {}
+
+    def check(self, replay):
+        key = (replay.size, replay.enemy, replay.enemies)
+        game = self.games.get(key)
+        if game is None:
+            game = GameState(make_enemy_brains(replay.enemy, replay.enemies, replay.size),
+                             replay.size)
+            self.games[key] = game
+        return check_replay(replay, game)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check snake replays')
+    commands = parser.add_subparsers(dest='command', required=True)
+    verify = commands.add_parser('verify', help='play replays headless and compare results')
+    verify.add_argument('paths', nargs='+', help='replay files or glob patterns')
+    info = commands.add_parser('info', help='show what a replay holds')
+    info.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        replay = Replay.load(args.path)
+        turns = sum(1 for _ in replay.iter_turns())
+        print('seed      %d' % replay.seed)
+        print('board     %dx%d, %d %s enemies' % (replay.size, replay.size,
+                                                  replay.enemies, replay.enemy))
+        print('result    score %d after %d ticks, %s' % (
+            replay.score, replay.ticks, replay.death or 'not lost'))
+        print('turns     %d in %d bytes' % (turns, len(replay.turns)))
+        return
+
+    paths = []
+    for pattern in args.paths:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    checker = ReplayChecker()
+    failed = 0
+    start = time.perf_counter()
+    for path in paths:
+        try:
+            problem = checker.check(Replay.load(path))
+        except (OSError, ReplayError) as error:
+            problem = str(error)
+        if problem is not None:
+            failed += 1
+            print('%s: %s' % (path, problem))
+    elapsed = time.perf_counter() - start
+    print('%d replays, %d failed, %.0f replays/min'
+          % (len(paths), failed, 60 * len(paths) / max(elapsed, 1e-9)))
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,689 @@
+import argparse
+import asyncio
+import random
+import socket
+import struct
+import subprocess
+import sys
+import time
+from array import array
+from collections import deque
+
+from snake_engine import (DIRECTIONS, LEFT_CODE, RIGHT_CODE, OPPOSITE, INPUT_QUEUE_SIZE,
+                          PLAYER, ENEMY, NO_FOOD, Occupancy, Snake, EnemySnake, enemy_starts,
+                          cell_typecode, free_row_tree)
+from snake_ai import ENEMY_BRAINS, make_enemy_brains
+
+# Several players on one board, over TCP:
+#
+#     python snake_server.py serve --port 7777
+#     python snake_server.py load --port 7777 --clients 100 200 400
+#
+# The server owns every room and steps them all at a fixed tick rate.
+# Turns from clients are queued as they arrive and applied on the next
+# tick, at most one per player per tick, as GameState does for the keyboard.
+# After each tick a room sends the same TICK message to all of its players,
+# holding only what changed: the cells each snake gained and lost, new
+# scores, and which turns were applied. Bodies are only sent in full once,
+# in the WELCOME a player gets on joining.
+#
+# Every message is a FRAME (payload length) followed by the payload, whose
+# first byte is its type:
+#
+#     WELCOME  room, player, board size, tick, food cell, then for every
+#              snake: entity, direction, score, length, cells
+#     TICK     tick, food cell, counts, then (entity, cell) pairs added,
+#              (entity, cell) pairs removed, (player, score) pairs, and
+#              (player, last turn applied, direction) triples
+#     INPUT    turn sequence number, direction          (client to server)
+#
+# Cells are y * size + x and directions are indexes into DIRECTIONS. Cell
+# pairs and scores are 16-bit on boards under 65536 cells, like snapshots.
+# Enemies are entities ENEMY_ENTITY + their index; players are numbered
+# from 0 within their room.
+
+FRAME = struct.Struct('<I')
+WELCOME = struct.Struct('<BHHHII')
+TICK = struct.Struct('<BIIHHHH')
+INPUT = struct.Struct('<BIB')
+WELCOME_TYPE, TICK_TYPE, INPUT_TYPE = 1, 2, 3
+ENEMY_ENTITY = 0x8000
+
+TICK_RATE = 15  # Ticks per second, as GAME_SPEED in snake_game
+ROOM_SIZE = 40
+ROOM_PLAYERS = 8
+RESPAWN_TICKS = 15  # Ticks a player sits out after dying
+MAX_BUFFERED = 256 * 1024  # Bytes queued for a client before it is dropped as too slow
+STATS_EVERY = 5.0  # Seconds between server reports
+PORT = 7777
+
+def frame(payload):
+    return FRAME.pack(len(payload)) + payload
+
+def distance(a, b, size):
+    # Between two packed cells
+    return abs(a % size - b % size) + abs(a // size - b // size)
+
+class Player:
+    def __init__(self, player_id, occupancy):
+        self.id = player_id
+        # No cells until Room.spawn() places it
+        self.snake = Snake.empty(occupancy)
+        self.alive = True
+        self.score = 0
+        self.inputs = deque()  # (sequence, direction code) waiting for a tick
+        self.latest = 0  # Last sequence number received, queued or not
+        self.acked = 0  # Last sequence number dealt with
+        self.reported = None  # (acked, direction) last sent to clients
+        self.respawn_at = 0
+
+class Room:
+    # One shared board: up to `capacity` players, each with their own
+    # Snake, and enemies that chase whichever player's head is nearest.
+    #
+    # A player who runs into a wall or any snake's body, or is caught,
+    # loses their snake and score and comes back RESPAWN_TICKS later on a
+    # random empty cell. Enemies that run into a wall start over.
+    def __init__(self, room_id, size=ROOM_SIZE, capacity=ROOM_PLAYERS, enemies=1,
+                 enemy='greedy', seed=None):
+        self.id = room_id
+        self.size = size
+        self.capacity = capacity
+        self.occupancy = Occupancy(size)
+        self.rng = random.Random(seed)
+        self.players = {}
+        starts = enemy_starts(size, enemies)
+        self.enemies = [EnemySnake(self.occupancy, brain, start, i)
+                        for i, (brain, start) in
+                        enumerate(zip(make_enemy_brains(enemy, enemies, size), starts))]
+        self.tick = 0
+        # Changes since the last TICK message
+        self.added = []
+        self.removed = []
+        self.scores = []
+        self.food = NO_FOOD  # Packed cell
+        self.place_food()
+
+    def place_food(self):
+        cell = self.occupancy.random_free_cell(self.rng)
+        self.food = NO_FOOD if cell is None else cell
+
+    @property
+    def full(self):
+        return len(self.players) >= self.capacity
+
+    def join(self):
+        player_id = min(set(range(self.capacity)) - set(self.players))
+        player = Player(player_id, self.occupancy)
+        # Off the board until the next tick places it
+        player.alive = False
+        player.respawn_at = self.tick
+        self.players[player_id] = player
+        return player_id
+
+    def leave(self, player_id):
+        self.remove_snake(self.players.pop(player_id))
+
+    def queue(self, player_id, sequence, code):
+        player = self.players.get(player_id)
+        if player is None:
+            return
+        player.latest = sequence
+        if len(player.inputs) < INPUT_QUEUE_SIZE:
+            player.inputs.append((sequence, code))
+
+    def remove_snake(self, player):
+        # Tail first, so clients can pop the cells off the end of the body
+        snake = player.snake
+        for cell in reversed(snake.cells):
+            self.occupancy.remove_cell(cell, PLAYER)
+            self.removed.append((player.id, cell))
+        snake.cells.clear()
+        player.alive = False
+
+    def kill(self, player):
+        self.remove_snake(player)
+        player.respawn_at = self.tick + RESPAWN_TICKS
+
+    def spawn(self, player):
+        start = self.occupancy.random_free_cell(self.rng)
+        if start is None:
+            return
+        snake = player.snake
+        x = start % self.size
+        snake.start = (x, start // self.size)
+        snake.reset()
+        # Face the far side of the board, for the longest run before a wall
+        snake.code = RIGHT_CODE if x < self.size // 2 else LEFT_CODE
+        player.inputs.clear()
+        player.acked = player.latest
+        player.alive = True
+        player.score = 0
+        self.added.append((player.id, start))
+        self.scores.append((player.id, 0))
+
+    def apply_input(self, player):
+        # The first queued turn that is not a repeat or a reversal; the
+        # others are dropped without using up the tick
+        snake = player.snake
+        while player.inputs:
+            sequence, code = player.inputs.popleft()
+            player.acked = sequence
+            if code != snake.code and code != OPPOSITE[snake.code]:
+                snake.code = code
+                break
+        if not player.inputs:
+            # Covers turns that arrived while the queue was full
+            player.acked = player.latest
+
+    def step(self):
+        # Advances the room one tick and returns its TICK message
+        occupancy = self.occupancy
+        added = self.added
+        removed = self.removed
+        players = list(self.players.values())
+        heads = []
+        for player in players:
+            if not player.alive:
+                continue
+            self.apply_input(player)
+            cells = player.snake.cells
+            tail = cells[-1]
+            length = len(cells)
+            if not player.snake.move():
+                self.kill(player)
+                continue
+            added.append((player.id, cells[0]))
+            if len(cells) == length:
+                removed.append((player.id, tail))
+            heads.append(cells[0])
+
+        if heads:
+            size = self.size
+            for enemy in self.enemies:
+                entity = ENEMY_ENTITY + enemy.enemy_id
+                cells = enemy.cells
+                head = cells[0]
+                tail = cells[-1]
+                target = min(heads, key=lambda cell: distance(cell, head, size))
+                if not enemy.move(target):
+                    for cell in reversed(cells):
+                        removed.append((entity, cell))
+                    enemy.reset()
+                    added.append((entity, cells[0]))
+                elif cells[0] != head:
+                    added.append((entity, cells[0]))
+                    removed.append((entity, tail))
+
+        board = occupancy.cells
+        for player in players:
+            if not player.alive:
+                continue
+            head = player.snake.cells[0]
+            if board[head] & ENEMY:
+                self.kill(player)
+            elif head == self.food:
+                player.snake.grow = True
+                player.score += 1
+                self.scores.append((player.id, player.score))
+                self.food = NO_FOOD
+        if self.food == NO_FOOD:
+            # Retried every tick while the board is full
+            self.place_food()
+
+        # Last, so a new snake's first cell and its first move arrive in
+        # different ticks
+        for player in players:
+            if not player.alive and player.respawn_at <= self.tick:
+                self.spawn(player)
+
+        acks = array('I')
+        for player in players:
+            report = (player.acked, player.snake.code)
+            if report != player.reported:
+                player.reported = report
+                acks.extend((player.id,) + report)
+
+        self.tick += 1
+        message = self.encode(TICK.pack(TICK_TYPE, self.tick, self.food,
+                                        len(added), len(removed), len(self.scores),
+                                        len(acks) // 3),
+                              [added, removed]) + acks.tobytes()
+        self.added = []
+        self.removed = []
+        self.scores = []
+        return message
+
+    def encode(self, header, cell_lists):
+        # (entity, cell) pairs of each list, then (player, score) pairs
+        values = array(cell_typecode(self.size))
+        for pairs in cell_lists:
+            for pair in pairs:
+                values.extend(pair)
+        for player, score in self.scores:
+            values.append(player)
+            values.append(min(score, (1 << 8 * values.itemsize) - 1))
+        return header + values.tobytes()
+
+    def check(self):
+        # What is wrong with the board, or None if every cell holds exactly
+        # the flags of the snakes on it and the empty cells are counted right
+        occupancy = self.occupancy
+        expected = bytearray(self.size * self.size)
+        for player in self.players.values():
+            for cell in player.snake.cells:
+                expected[cell] |= PLAYER
+        for enemy in self.enemies:
+            for cell in enemy.cells:
+                expected[cell] |= ENEMY
+        if expected != occupancy.cells:
+            cell = next(i for i, flags in enumerate(expected) if flags != occupancy.cells[i])
+            return 'cell %d has flags %d but its snakes make %d' % (
+                cell, occupancy.cells[cell], expected[cell])
+        if occupancy.free_cells != expected.count(0):
+            return 'free cell count does not match the empty cells'
+        occupancy.update_rows()
+        if occupancy.free_rows != free_row_tree(expected, self.size):
+            return 'row counts do not match the empty cells'
+        return None
+
+    def welcome(self, player_id):
+        values = array('I')
+        snakes = [(player.id, player.snake, player.score) for player in self.players.values()]
+        snakes += [(ENEMY_ENTITY + enemy.enemy_id, enemy, 0) for enemy in self.enemies]
+        for entity, snake, score in snakes:
+            if snake.cells:
+                values.extend((entity, snake.code, score, len(snake.cells)))
+                values.extend(snake.cells)
+        return WELCOME.pack(WELCOME_TYPE, self.id, player_id, self.size, self.tick,
+                            self.food) + values.tobytes()
+
+class RoomClient:
+    # A client's copy of its room, kept up to date from the server's
+    # messages, plus a prediction of where its own snake is going.
+    #
+    # Turns are sent straight away but the server only applies them on its
+    # next tick, one per tick. predict() plays the turns that have not been
+    # acknowledged yet over the last body the server sent, the way the
+    # server will, so the client can show its own snake ahead of the
+    # server. Each TICK replaces the prediction with the server's state
+    # (reconciliation); corrections counts the ticks on which the server
+    # disagreed with the prediction.
+    def __init__(self):
+        self.bodies = {}  # entity -> deque of (x, y), head first
+        self.directions = {}  # player -> direction, from acknowledgements
+        self.scores = {}
+        self.player = None
+        self.room = None
+        self.size = 0
+        self.tick = 0
+        self.food_pos = None
+        self.sequence = 0
+        self.acked = 0
+        self.pending = deque()  # (sequence, direction) sent but not yet applied
+        self.expected = None  # Predicted head after the next tick
+        self.ticks = 0
+        self.corrections = 0
+
+    def position(self, cell):
+        return None if cell == NO_FOOD else (cell % self.size, cell // self.size)
+
+    def receive(self, payload):
+        if payload[0] == WELCOME_TYPE:
+            self.welcome(payload)
+        elif payload[0] == TICK_TYPE:
+            self.update(payload)
+
+    def welcome(self, payload):
+        _, self.room, self.player, self.size, self.tick, food = WELCOME.unpack_from(payload)
+        self.food_pos = self.position(food)
+        values = array('I')
+        values.frombytes(payload[WELCOME.size:])
+        position = 0
+        while position < len(values):
+            entity, direction, score, length = values[position:position + 4]
+            position += 4
+            self.bodies[entity] = deque(self.position(cell)
+                                        for cell in values[position:position + length])
+            position += length
+            if entity < ENEMY_ENTITY:
+                self.directions[entity] = DIRECTIONS[direction]
+                self.scores[entity] = score
+
+    def update(self, payload):
+        _, self.tick, food, added, removed, scores, acks = TICK.unpack_from(payload)
+        self.food_pos = self.position(food)
+        values = array(cell_typecode(self.size))
+        end = TICK.size + (added + removed + scores) * 2 * values.itemsize
+        values.frombytes(payload[TICK.size:end])
+        bodies = self.bodies
+        # New heads go on first. Every cell removed is then the last one of
+        # its body, whether a tail moved on or a whole snake was taken off
+        # (tail first) after moving.
+        for i in range(0, added * 2, 2):
+            body = bodies.get(values[i])
+            if body is None:
+                body = bodies[values[i]] = deque()
+            body.appendleft(self.position(values[i + 1]))
+        for i in range(added * 2, (added + removed) * 2, 2):
+            body = bodies.get(values[i])
+            if body:
+                pos = self.position(values[i + 1])
+                if body[-1] == pos:
+                    body.pop()
+                elif pos in body:
+                    # Otherwise it left before we joined, and the WELCOME
+                    # never had it
+                    body.remove(pos)
+                if not body:
+                    del bodies[values[i]]
+        for i in range((added + removed) * 2, (added + removed + scores) * 2, 2):
+            self.scores[values[i]] = values[i + 1]
+        triples = array('I')
+        triples.frombytes(payload[end:])
+        for i in range(0, acks * 3, 3):
+            player, sequence, direction = triples[i:i + 3]
+            self.directions[player] = DIRECTIONS[direction]
+            if player == self.player:
+                self.acked = sequence
+                while self.pending and self.pending[0][0] <= sequence:
+                    self.pending.popleft()
+
+        own = bodies.get(self.player)
+        if own and self.expected is not None and own[0] != self.expected:
+            self.corrections += 1
+        self.ticks += 1
+        self.expected = self.predict_head()
+
+    def turn(self, direction):
+        # Returns the INPUT message to send, or None if the server would
+        # drop the turn anyway or we have no snake to turn
+        last = self.pending[-1][1] if self.pending else self.directions.get(self.player)
+        if (self.player not in self.bodies or direction == last or
+                (last[0] + direction[0] == 0 and last[1] + direction[1] == 0) or
+                len(self.pending) >= INPUT_QUEUE_SIZE):
+            return None
+        self.sequence += 1
+        self.pending.append((self.sequence, direction))
+        self.expected = self.predict_head()
+        return frame(INPUT.pack(INPUT_TYPE, self.sequence, DIRECTIONS.index(direction)))
+
+    def predict(self, ahead=1):
+        # Own body `ahead` ticks after the last tick received. Food and
+        # collisions are left to the server.
+        own = self.bodies.get(self.player)
+        if not own:
+            return None
+        body = deque(own)
+        direction = self.directions[self.player]
+        turns = deque(turn for _, turn in self.pending)
+        for _ in range(ahead):
+            while turns:
+                turn = turns.popleft()
+                if turn != direction and (direction[0] + turn[0] or direction[1] + turn[1]):
+                    direction = turn
+                    break
+            head = body[0]
+            body.appendleft((head[0] + direction[0], head[1] + direction[1]))
+            body.pop()
+        return body
+
+    def predict_head(self):
+        body = self.predict()
+        return body[0] if body else None
+
+class GameServer:
+    # Runs every room in one asyncio loop. Players are put in the first
+    # room with space, and a room is closed when its last player leaves.
+    def __init__(self, size=ROOM_SIZE, capacity=ROOM_PLAYERS, enemies=1, enemy='greedy',
+                 tick_rate=TICK_RATE, verbose=True):
+        self.size = size
+        self.capacity = capacity
+        self.enemies = enemies
+        self.enemy = enemy
+        self.tick_rate = tick_rate
+        self.verbose = verbose
+        self.rooms = {}
+        self.clients = {}  # room id -> {player: StreamWriter}
+        self.tick_times = deque(maxlen=int(tick_rate * STATS_EVERY))
+        self.late_ticks = 0
+        self.bytes_sent = 0
+
+    def find_room(self):
+        for room in self.rooms.values():
+            if not room.full:
+                return room
+        room_id = min(set(range(len(self.rooms) + 1)) - set(self.rooms))
+        room = Room(room_id, self.size, self.capacity, self.enemies, self.enemy)
+        self.rooms[room_id] = room
+        self.clients[room_id] = {}
+        return room
+
+    async def handle(self, reader, writer):
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        room = self.find_room()
+        player = room.join()
+        self.clients[room.id][player] = writer
+        writer.write(frame(room.welcome(player)))
+        try:
+            while True:
+                length = FRAME.unpack(await reader.readexactly(FRAME.size))[0]
+                payload = await reader.readexactly(length)
+                if payload[0] == INPUT_TYPE and len(payload) == INPUT.size:
+                    _, sequence, direction = INPUT.unpack(payload)
+                    if direction < len(DIRECTIONS):
+                        room.queue(player, sequence, direction)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            room.leave(player)
+            del self.clients[room.id][player]
+            if not room.players:
+                del self.rooms[room.id]
+                del self.clients[room.id]
+            writer.close()
+
+    def step(self):
+        for room_id, room in list(self.rooms.items()):
+            message = frame(room.step())
+            for writer in list(self.clients[room_id].values()):
+                if writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+                    # Not reading fast enough; its handler cleans up
+                    writer.transport.abort()
+                    continue
+                writer.write(message)
+                self.bytes_sent += len(message)
+
+    async def run(self):
+        # Fixed tick: each tick is due tick_time after the last one was due,
+        # however long stepping took. A server that falls more than a tick
+        # behind skips ahead rather than running ticks back to back.
+        loop = asyncio.get_running_loop()
+        tick_time = 1 / self.tick_rate
+        due = loop.time()
+        last_report = time.perf_counter()
+        while True:
+            due += tick_time
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.late_ticks += 1
+                if delay < -tick_time:
+                    due = loop.time()
+                await asyncio.sleep(0)
+            start = time.perf_counter()
+            self.step()
+            self.tick_times.append(time.perf_counter() - start)
+            if self.verbose and start - last_report >= STATS_EVERY:
+                print(self.report(start - last_report), flush=True)
+                self.bytes_sent = 0
+                last_report = start
+
+    def report(self, elapsed):
+        times = sorted(self.tick_times) or [0.0]
+        players = sum(len(room.players) for room in self.rooms.values())
+        return ('rooms %d  players %d  tick p50 %.2f ms  max %.2f ms  late %d  out %.1f KB/s'
+                % (len(self.rooms), players, 1000 * times[len(times) // 2], 1000 * times[-1],
+                   self.late_ticks, self.bytes_sent / elapsed / 1024))
+
+    async def serve(self, host='127.0.0.1', port=PORT):
+        server = await asyncio.start_server(self.handle, host, port, backlog=4096)
+        async with server:
+            await self.run()
+
+class LoadStats:
+    def __init__(self):
+        self.connected = 0
+        self.failed = 0
+        self.rooms = set()
+        self.ticks = []  # Ticks received by each client
+        self.bytes = 0
+        self.latencies = []  # Seconds from sending a turn to it being applied
+        self.corrections = 0
+
+async def run_client(host, port, seconds, turn_chance, rng, stats):
+    # One headless player: turns at random and keeps its RoomClient
+    # up to date until time is up
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        stats.failed += 1
+        return
+    writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    stats.connected += 1
+    client = RoomClient()
+    sent = {}
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    try:
+        while loop.time() < end:
+            length = FRAME.unpack(await reader.readexactly(FRAME.size))[0]
+            payload = await reader.readexactly(length)
+            stats.bytes += FRAME.size + length
+            client.receive(payload)
+            now = loop.time()
+            for sequence in [s for s in sent if s <= client.acked]:
+                stats.latencies.append(now - sent.pop(sequence))
+            if rng.random() < turn_chance:
+                message = client.turn(rng.choice(DIRECTIONS))
+                if message is not None:
+                    writer.write(message)
+                    sent[client.sequence] = now
+    except (asyncio.IncompleteReadError, ConnectionError):
+        stats.failed += 1
+    stats.rooms.add(client.room)
+    stats.ticks.append(client.ticks)
+    stats.corrections += client.corrections
+    writer.close()
+
+async def run_load(host, port, clients, seconds, turn_chance, seed):
+    stats = LoadStats()
+    rng = random.Random(seed)
+    await asyncio.gather(*[run_client(host, port, seconds, turn_chance,
+                                      random.Random(rng.getrandbits(64)), stats)
+                           for _ in range(clients)])
+    return stats
+
+def check_rooms(rooms=20, ticks=500, seed=0):
+    # Plays rooms in this process with players joining, leaving and turning
+    # at random, and checks the board against the snakes after every join,
+    # leave and tick. Returns the number of ticks checked.
+    rng = random.Random(seed)
+    for room_id in range(rooms):
+        room = Room(room_id, size=rng.choice((10, 20, ROOM_SIZE)), seed=rng.getrandbits(64))
+        for _ in range(ticks):
+            if not room.full and rng.random() < 0.2:
+                room.join()
+            elif room.players and rng.random() < 0.05:
+                room.leave(rng.choice(list(room.players)))
+            problem = room.check()
+            assert problem is None, (room_id, room.tick, 'join or leave', problem)
+            for player_id in room.players:
+                if rng.random() < 0.2:
+                    room.queue(player_id, room.tick, rng.randrange(4))
+            room.step()
+            problem = room.check()
+            assert problem is None, (room_id, room.tick, 'tick', problem)
+    return rooms * ticks
+
+def load_report(clients, seconds, tick_rate, stats):
+    ticks = stats.ticks or [0]
+    received = sum(ticks)
+    latencies = sorted(stats.latencies) or [0.0]
+    return ('%5d clients  %3d rooms  %d failed  ticks/s mean %.1f min %.1f of %d  '
+            '%.0f B/tick  turn applied after p50 %.0f ms p99 %.0f ms  corrections %.1f%%'
+            % (clients, len(stats.rooms - {None}), stats.failed,
+               received / len(ticks) / seconds, min(ticks) / seconds, tick_rate,
+               stats.bytes / max(received, 1),
+               1000 * latencies[len(latencies) // 2],
+               1000 * latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)],
+               100 * stats.corrections / max(received, 1)))
+
+def wait_for_port(host, port, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            socket.create_connection((host, port), 0.5).close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            time.sleep(0.05)
+
+def main():
+    parser = argparse.ArgumentParser(description='Multiplayer snake server and load generator')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help='run a server')
+    load = commands.add_parser('load', help='connect many headless players to a server')
+    for command in (serve, load):
+        command.add_argument('--host', default='127.0.0.1')
+        command.add_argument('--port', type=int, default=PORT)
+    serve.add_argument('--size', type=int, default=ROOM_SIZE, help='cells along each side of a room')
+    serve.add_argument('--players', type=int, default=ROOM_PLAYERS, help='players per room')
+    serve.add_argument('--enemies', type=int, default=1, help='enemies per room')
+    serve.add_argument('--enemy', choices=ENEMY_BRAINS, default='greedy')
+    serve.add_argument('--tick-rate', type=int, default=TICK_RATE)
+    serve.add_argument('--quiet', action='store_true')
+    load.add_argument('--clients', type=int, nargs='+', default=[100],
+                      help='players to connect; several counts are run one after another')
+    load.add_argument('--seconds', type=float, default=10.0, help='time each count is held for')
+    load.add_argument('--turn-chance', type=float, default=0.2, help='chance of a turn each tick')
+    load.add_argument('--tick-rate', type=int, default=TICK_RATE, help="the server's tick rate")
+    load.add_argument('--seed', type=int, default=0)
+    load.add_argument('--spawn', action='store_true',
+                      help='start a server with default settings in another process first')
+    load.add_argument('--no-check', dest='check', action='store_false',
+                      help='skip checking rooms in this process first')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        server = GameServer(args.size, args.players, args.enemies, args.enemy,
+                            args.tick_rate, not args.quiet)
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.check:
+        print('rooms: the board matched the snakes for %d ticks of joins and leaves'
+              % check_rooms(), flush=True)
+    process = None
+    if args.spawn:
+        process = subprocess.Popen([sys.executable, __file__, 'serve', '--host', args.host,
+                                    '--port', str(args.port),
+                                    '--tick-rate', str(args.tick_rate)])
+        wait_for_port(args.host, args.port)
+    try:
+        for clients in args.clients:
+            stats = asyncio.run(run_load(args.host, args.port, clients, args.seconds,
+                                         args.turn_chance, args.seed))
+            print(load_report(clients, args.seconds, args.tick_rate, stats), flush=True)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import os
+import random
+import struct
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from snake_engine import GRID_COUNT, WALL, SELF, CAUGHT, GameState
+from snake_ai import ENEMY_BRAINS, PLAYER_POLICIES, make_enemy_brains, make_player_policy
+
+# Runs large batches of headless games on every core:
+#
+#     python snake_tournament.py --games 1000000 --player cautious --enemy flow
+#
+# Games are handed out in chunks, each with its own seed, so a sweep gives
+# the same results however many workers run it. Workers send back one
+# packed RECORD per game and the totals are kept as running sums, so memory
+# use does not grow with the number of games.
+
+TIMEOUT = 'timeout'  # Still alive after max_ticks
+ENDINGS = (None, WALL, SELF, CAUGHT, TIMEOUT)  # None means the game was won
+
+# score, ticks survived, index into ENDINGS, victory
+RECORD = struct.Struct('<HIBB')
+
+def chunk_seed(seed, chunk):
+    return (seed << 32) + chunk
+
+def play_chunk(player, enemy, enemies, size, games, seed, max_ticks):
+    # Runs in a worker process; returns the packed records of its games
+    rng = random.Random(seed)
+    game = GameState(make_enemy_brains(enemy, enemies, size), size)
+    records = bytearray()
+    for _ in range(games):
+        game.reset(rng.getrandbits(64))
+        policy = make_player_policy(player)
+        while game.ticks < max_ticks and game.step(policy(game, rng)):
+            pass
+        if game.game_over:
+            ending = game.death
+        else:
+            ending = None if game.victory else TIMEOUT
+        records += RECORD.pack(min(game.score, 0xFFFF), game.ticks,
+                               ENDINGS.index(ending), game.victory)
+    return bytes(records)
+
+class Summary:
+    # Running statistics over any number of game records
+    def __init__(self):
+        self.games = 0
+        self.victories = 0
+        self.best_score = 0
+        self.total_ticks = 0
+        self.mean_score = 0.0
+        self.score_m2 = 0.0  # Welford's sum of squared differences
+        self.endings = dict.fromkeys(ENDINGS, 0)
+
+    def add(self, score, ticks, ending, victory):
+        self.games += 1
+        self.victories += victory
+        self.best_score = max(self.best_score, score)
+        self.total_ticks += ticks
+        self.endings[ENDINGS[ending]] += 1
+        delta = score - self.mean_score
+        self.mean_score += delta / self.games
+        self.score_m2 += delta * (score - self.mean_score)
+
+    def add_records(self, records):
+        for record in RECORD.iter_unpack(records):
+            self.add(*record)
+
+    def report(self):
+        games = max(self.games, 1)
+        spread = (self.score_m2 / games) ** 0.5
+        lines = [
+            'games      %d' % self.games,
+            'score      mean %.3f, std %.3f, best %d' % (self.mean_score, spread, self.best_score),
+            'ticks      mean %.1f' % (self.total_ticks / games),
+            'victories  %d (%.2f%%)' % (self.victories, 100 * self.victories / games),
+        ]
+        for ending in ENDINGS[1:]:
+            count = self.endings[ending]
+            lines.append('%-10s %d (%.2f%%)' % (ending, count, 100 * count / games))
+        return '\n'.join(lines)
+
+def run_tournament(games, player='cautious', enemy='greedy', enemies=1, size=GRID_COUNT,
+                   workers=None, chunk=200, seed=0, max_ticks=10000, out=None):
+    # Plays `games` games across a process pool and returns their Summary.
+    # If out is an open binary file, every record is appended to it.
+    workers = workers or os.cpu_count()
+    summary = Summary()
+    chunks = (games + chunk - 1) // chunk
+    submitted = 0
+    pending = set()
+    with ProcessPoolExecutor(workers) as pool:
+        while submitted < chunks or pending:
+            # Keep a couple of chunks queued per worker, no more
+            while submitted < chunks and len(pending) < workers * 2:
+                count = min(chunk, games - submitted * chunk)
+                pending.add(pool.submit(play_chunk, player, enemy, enemies, size, count,
+                                        chunk_seed(seed, submitted), max_ticks))
+                submitted += 1
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                records = future.result()
+                summary.add_records(records)
+                if out is not None:
+                    out.write(records)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Play many headless snake games')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--player', choices=sorted(PLAYER_POLICIES), default='cautious')
+    parser.add_argument('--enemy', choices=ENEMY_BRAINS, default='greedy')
+    parser.add_argument('--enemies', type=int, default=1)
+    parser.add_argument('--size', type=int, default=GRID_COUNT)
+    parser.add_argument('--workers', type=int, default=None, help='default: one per core')
+    parser.add_argument('--chunk', type=int, default=200, help='games per work item')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-ticks', type=int, default=10000)
+    parser.add_argument('--out', help='append every game record to this file')
+    args = parser.parse_args()
+
+    out = open(args.out, 'ab') if args.out else None
+    start = time.perf_counter()
+    try:
+        summary = run_tournament(args.games, args.player, args.enemy, args.enemies,
+                                 args.size, args.workers, args.chunk, args.seed,
+                                 args.max_ticks, out)
+    finally:
+        if out is not None:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(summary.report())
+    print('%.1f s, %.0f games/s' % (elapsed, summary.games / elapsed))
+
+if __name__ == '__main__':
+    main()
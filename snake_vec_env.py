@@ -0,0 +1,155 @@
+import numpy as np
+
+from snake_engine import GRID_COUNT, WIN_SCORE, PLAYER, ENEMY, DIRECTIONS, enemy_starts
+
+# Actions are indexes into DIRECTIONS; NO_TURN keeps the current direction
+NO_TURN = -1
+DX = np.array([direction[0] for direction in DIRECTIONS])
+DY = np.array([direction[1] for direction in DIRECTIONS])
+OPPOSITE = np.array([DIRECTIONS.index([-direction[0], -direction[1]])
+                     for direction in DIRECTIONS])
+RIGHT_CODE = DIRECTIONS.index([1, 0])
+ENEMY_MOVE_EVERY = 2
+
+class VectorSnakeEnv:
+    # Many games of snake_engine.GameState (one player, one enemy with the
+    # original chase) stepped together with NumPy. Every per-game value is a
+    # row of an array, so one step() call advances all games at once.
+    #
+    # Cells are numbered y * size + x. Each body is a ring buffer: the head
+    # is body[game, head_ptr[game]] and the segments behind it run backwards
+    # for length[game] entries.
+    #
+    # Games that end are restarted inside step(); their final score, ticks
+    # and victory flag are left in final_score, final_ticks and final_victory.
+    def __init__(self, num_games, size=GRID_COUNT, seed=None):
+        self.num_games = num_games
+        self.size = size
+        self.cells = size * size
+        self.rng = np.random.default_rng(seed)
+        self.games = np.arange(num_games)
+        self.start = (size // 2) * size + size // 2
+        enemy_x, enemy_y = [pos for pos in enemy_starts(size, 2)
+                            if pos != (size // 2, size // 2)][0]
+        self.enemy_start = enemy_y * size + enemy_x
+
+        self.body = np.zeros((num_games, self.cells), np.int32)
+        self.head_ptr = np.zeros(num_games, np.int32)
+        self.length = np.zeros(num_games, np.int32)
+        self.direction = np.zeros(num_games, np.int8)
+        self.grow = np.zeros(num_games, bool)
+        self.occupancy = np.zeros((num_games, self.cells), np.uint8)
+        self.enemy = np.zeros(num_games, np.int32)
+        self.enemy_counter = np.zeros(num_games, np.int32)
+        self.food = np.zeros(num_games, np.int32)
+        self.score = np.zeros(num_games, np.int32)
+        self.ticks = np.zeros(num_games, np.int32)
+        self.final_score = np.zeros(num_games, np.int32)
+        self.final_ticks = np.zeros(num_games, np.int32)
+        self.final_victory = np.zeros(num_games, bool)
+        self.reset(self.games)
+
+    def reset(self, games):
+        self.occupancy[games] = 0
+        self.head_ptr[games] = 0
+        self.length[games] = 1
+        self.body[games, 0] = self.start
+        self.occupancy[games, self.start] = PLAYER
+        self.direction[games] = RIGHT_CODE
+        self.grow[games] = False
+        self.enemy[games] = self.enemy_start
+        self.occupancy[games, self.enemy_start] |= ENEMY
+        self.enemy_counter[games] = 0
+        self.score[games] = 0
+        self.ticks[games] = 0
+        # The board cannot be full straight after a reset
+        self.place_food(games)
+
+    def heads(self):
+        return self.body[self.games, self.head_ptr]
+
+    def place_food(self, games):
+        # One uniformly random empty cell per game, all games at once.
+        # Returns which of them had no empty cell left.
+        free = self.occupancy[games] == 0
+        counts = free.sum(axis=1)
+        picks = (self.rng.random(len(games)) * counts).astype(np.int64)
+        self.food[games] = np.argmax(free.cumsum(axis=1) > picks[:, None], axis=1)
+        return counts == 0
+
+    def step(self, actions):
+        # Advance every game by one tick. actions holds one DIRECTIONS index
+        # (or NO_TURN) per game. Returns the reward (food eaten this tick)
+        # and done flag of each game; done games have already been restarted.
+        size = self.size
+        games = self.games
+        occupancy = self.occupancy
+
+        # Turn, unless that would reverse the snake
+        actions = np.asarray(actions)
+        turn = (actions != NO_TURN) & (OPPOSITE[self.direction] != actions)
+        self.direction[turn] = actions[turn]
+
+        # Move snake and check for collisions. The tail still counts for the
+        # self-hit check: it only vacates its cell once the head has moved in.
+        head = self.body[games, self.head_ptr]
+        x = head % size + DX[self.direction]
+        y = head // size + DY[self.direction]
+        wall = (x < 0) | (x >= size) | (y < 0) | (y >= size)
+        new_head = np.where(wall, head, y * size + x)
+        self_hit = ~wall & (occupancy[games, new_head] & PLAYER != 0)
+        game_over = wall | self_hit
+
+        moved = np.flatnonzero(~game_over)
+        self.head_ptr[moved] = (self.head_ptr[moved] + 1) % self.cells
+        self.body[moved, self.head_ptr[moved]] = new_head[moved]
+        occupancy[moved, new_head[moved]] |= PLAYER
+        shrink = moved[~self.grow[moved]]
+        tail = self.body[shrink, (self.head_ptr[shrink] - self.length[shrink]) % self.cells]
+        occupancy[shrink, tail] &= ~np.uint8(PLAYER)
+        grew = moved[self.grow[moved]]
+        self.length[grew] += 1
+        self.grow[grew] = False
+        head = self.body[games, self.head_ptr]
+
+        # Move enemy snakes every other tick, along the larger gap to the player
+        self.enemy_counter += 1
+        due = self.enemy_counter >= ENEMY_MOVE_EVERY
+        self.enemy_counter[due] = 0
+        enemy_x = self.enemy % size
+        enemy_y = self.enemy // size
+        dx = head % size - enemy_x
+        dy = head // size - enemy_y
+        across = np.abs(dx) > np.abs(dy)
+        enemy_x = enemy_x + np.where(across, np.where(dx > 0, 1, -1), 0)
+        enemy_y = enemy_y + np.where(across, 0, np.where(dy > 0, 1, -1))
+        enemy_wall = due & ((enemy_x < 0) | (enemy_x >= size) |
+                            (enemy_y < 0) | (enemy_y >= size))
+        game_over |= enemy_wall
+        stepping = np.flatnonzero(due & ~enemy_wall)
+        occupancy[stepping, self.enemy[stepping]] &= ~np.uint8(ENEMY)
+        self.enemy[stepping] = (enemy_y * size + enemy_x)[stepping]
+        occupancy[stepping, self.enemy[stepping]] |= ENEMY
+
+        # Check if enemy caught the player
+        game_over |= self.enemy == head
+
+        # Check for food collision
+        eaten = head == self.food
+        self.grow[eaten] = True
+        self.score[eaten] += 1
+        victory = eaten & (self.score >= WIN_SCORE)
+        respawn = np.flatnonzero(eaten & ~victory)
+        if len(respawn):
+            # Nowhere left to put food: the board is full, which is a win
+            victory[respawn[self.place_food(respawn)]] = True
+
+        self.ticks += 1
+        done = game_over | victory
+        finished = np.flatnonzero(done)
+        if len(finished):
+            self.final_score[finished] = self.score[finished]
+            self.final_ticks[finished] = self.ticks[finished]
+            self.final_victory[finished] = victory[finished]
+            self.reset(finished)
+        return eaten, done
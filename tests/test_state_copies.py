@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from snake_engine import GameState
+from snake_ai import ENEMY_BRAINS, cautious_player, make_enemy_brains
+
+# Plays games checking, every tick, that a restored snapshot and a clone are
+# exactly the game they came from, go on to play exactly like it, and that a
+# clone left alone is not changed by the others. Snapshots hold all of a
+# game's state, so comparing them compares everything.
+
+TICKS = 300
+
+@pytest.mark.parametrize('size', [12, 30])
+@pytest.mark.parametrize('brain', ENEMY_BRAINS)
+@pytest.mark.parametrize('enemies', [1, 5])
+def test_snapshots_and_clones_match_the_game(size, brain, enemies):
+    def new_game():
+        return GameState(make_enemy_brains(brain, enemies, size), size)
+
+    game = new_game()
+    restored = new_game()
+    rng = random.Random(size)
+    for seed in range(3):
+        game.reset(seed)
+        while game.ticks < TICKS:
+            before = game.snapshot()
+            restored.restore(before)
+            assert restored.snapshot() == before, (seed, game.ticks)
+            clone = game.clone()
+            kept = game.clone()
+            assert clone.snapshot() == before, (seed, game.ticks)
+            action = cautious_player(game, rng)
+            alive = game.step(action)
+            assert clone.step(action) == alive
+            assert restored.step(action) == alive
+            after = game.snapshot()
+            assert clone.snapshot() == after, (seed, game.ticks)
+            assert restored.snapshot() == after, (seed, game.ticks)
+            assert kept.snapshot() == before, (seed, game.ticks)
+            if not alive:
+                break
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from snake_engine import GRID_COUNT, DIRECTIONS, GameState
+from snake_vec_env import NO_TURN, VectorSnakeEnv
+
+# Plays the same moves in VectorSnakeEnv and in one GameState per game and
+# compares them after every tick. Food is random in both, so the scalar games
+# are handed the vector env's food cells, after checking each one is empty
+# there. Small boards end games often, so resets get checked too.
+
+GAMES = 64
+
+@pytest.mark.parametrize('size, ticks', [(GRID_COUNT, 3000), (8, 1000)])
+def test_vector_games_follow_game_state(size, ticks):
+    env = VectorSnakeEnv(GAMES, size, seed=0)
+    scalar = [GameState(size=size) for _ in range(GAMES)]
+    rng = np.random.default_rng(1)
+
+    def cell(index):
+        return (int(index) % size, int(index) // size)
+
+    for i, game in enumerate(scalar):
+        game.food_pos = cell(env.food[i])
+    for tick in range(ticks):
+        # Mostly head for the food, with some random turns and no-ops
+        heads = env.heads()
+        dx = env.food % size - heads % size
+        dy = env.food // size - heads // size
+        towards = np.where(dx != 0, np.where(dx > 0, 3, 2), np.where(dy > 0, 1, 0))
+        noise = rng.random(GAMES)
+        actions = np.where(noise < 0.2, rng.integers(NO_TURN, 4, GAMES), towards)
+
+        _, done = env.step(actions)
+        for i, game in enumerate(scalar):
+            score = game.score
+            game.step(None if actions[i] == NO_TURN else DIRECTIONS[actions[i]])
+            assert game.done == done[i], (tick, i, 'done')
+            if game.done:
+                assert (game.score, game.ticks, game.victory) == (
+                    env.final_score[i], env.final_ticks[i], env.final_victory[i]), (tick, i)
+                game.reset()
+                game.food_pos = cell(env.food[i])
+                continue
+            if game.score != score:
+                food = cell(env.food[i])
+                assert not game.occupancy.occupied(food), (tick, i, 'food on snake')
+                game.food_pos = food
+            ring = [env.body[i, (env.head_ptr[i] - k) % env.cells] for k in range(env.length[i])]
+            assert list(game.snake.body) == [cell(index) for index in ring], (tick, i, 'body')
+            assert game.enemy_snake.body[0] == cell(env.enemy[i]), (tick, i, 'enemy')
+            assert game.food_pos == cell(env.food[i]), (tick, i, 'food')
+            assert (game.score, game.ticks) == (env.score[i], env.ticks[i]), (tick, i)